@@ -6,8 +6,9 @@ from starkware.starknet.common.syscalls import get_tx_signature, get_contract_ad
 from starkware.cairo.common.uint256 import Uint256, uint256_eq
 from starkware.cairo.common.math import assert_nn
 
-from utils.Array import concat_arr, assert_array_includes, array_remove_element, array_includes
-from utils.DecentralMediaHelper import deserialize, Array, Uint256_to_felt, felt_to_Uint256
+from utils.Array import concat_arr
+from utils.DecentralMediaHelper import deserialize, append_properties, append_felt, Array, Uint256_to_felt, felt_to_Uint256, pack_lanes, unpack_lanes, LIKES_BIAS, migrate_property_array
+from utils.IndexedSet import indexed_set_length, indexed_set_includes, indexed_set_add, indexed_set_remove, indexed_set_read
 from utils.utils import verify_inputs_by_signature
 from starknet_erc721_storage.IStorage import IStorage
 from IERC721 import IERC721
@@ -25,6 +26,42 @@ end
 func comment_counter() -> (token_id : felt):
 end
 
+# Packed likes.
+@storage_var
+func comment_stats(token_id : felt) -> (packed : felt):
+end
+
+# Packed created_at. The creator and content are token ids, which do not fit
+# a lane (tokens minted before felt_to_Uint256 was fixed have ids n * 2**128).
+@storage_var
+func comment_meta(token_id : felt) -> (packed : felt):
+end
+
+@storage_var
+func comment_creator(token_id : felt) -> (creator : felt):
+end
+
+@storage_var
+func comment_content(token_id : felt) -> (content : felt):
+end
+
+
+#
+# Events
+#
+
+@event
+func CommentCreated(token_id : felt, content : felt, creator : felt, created_at : felt):
+end
+
+@event
+func CommentLiked(token_id : felt, user_token_id : felt):
+end
+
+@event
+func CommentDisliked(token_id : felt, user_token_id : felt):
+end
+
 
 #
 # Getters
@@ -51,23 +88,167 @@ func Comment_getComment{
 
     let names : felt* = alloc()
     assert [names] = 'comment'
-    assert [names + 1] = 'liked_by'
-    assert [names + 2] = 'disliked_by'
-    assert [names + 3] = 'likes'
-    assert [names + 4] = 'created_at'
-    assert [names + 5] = 'creator'
-    assert [names + 6] = 'content'
-
-    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 7, names, token_id)
+
+    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 1, names, token_id)
     let (data_len: felt, data: Array*) = deserialize(offsets_len, offsets, properties_len, properties)
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    let (created_at: felt, creator: felt, content: felt) = Comment_readMeta(contract, token_id)
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (liked_by_len: felt) = indexed_set_length('comment_liked_by', token_id_felt)
+    let (liked_by_len: felt, liked_by: felt*) = indexed_set_read('comment_liked_by', token_id_felt, 0, liked_by_len)
+    let (disliked_by_len: felt) = indexed_set_length('comment_disliked_by', token_id_felt)
+    let (disliked_by_len: felt, disliked_by: felt*) = indexed_set_read('comment_disliked_by', token_id_felt, 0, disliked_by_len)
 
     return (data[0].len, data[0].arr,
-            data[1].len, data[1].arr,
-            data[2].len, data[2].arr,
-            data[3].arr[0],
-            data[4].arr[0],
-            data[5].arr[0],
-            data[6].arr[0])
+            liked_by_len, liked_by,
+            disliked_by_len, disliked_by,
+            likes,
+            created_at,
+            creator,
+            content)
+end
+
+
+func Comment_getLikedBy{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    liked_by_len: felt,
+    liked_by: felt*):
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (liked_by_len: felt, liked_by: felt*) = indexed_set_read('comment_liked_by', token_id_felt, offset, limit)
+    return (liked_by_len, liked_by)
+end
+
+func Comment_getDislikedBy{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    disliked_by_len: felt,
+    disliked_by: felt*):
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (disliked_by_len: felt, disliked_by: felt*) = indexed_set_read('comment_disliked_by', token_id_felt, offset, limit)
+    return (disliked_by_len, disliked_by)
+end
+
+func Comment_getComments{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    alloc_locals
+
+    let (contract) = comment_contract.read()
+
+    let (local names : felt*) = alloc()
+    assert [names] = 'comment'
+
+    let (local offsets : felt*) = alloc()
+    let (local values : felt*) = alloc()
+    let (offsets_len, values_len) = Comment_serializeComments(contract, names, token_ids_len, token_ids, 0, offsets, 0, values)
+
+    return (offsets_len, offsets, values_len, values)
+end
+
+func Comment_serializeComments{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    names : felt*,
+    token_ids_len : felt,
+    token_ids : felt*,
+    offsets_len : felt,
+    offsets : felt*,
+    values_len : felt,
+    values : felt*) -> (
+    offsets_len: felt,
+    values_len: felt):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return (offsets_len, values_len)
+    end
+
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (properties_offsets_len, properties_offsets, properties_len, properties) = IStorage.getProperties(contract, 1, names, token_id)
+    let (offsets_len, values_len) = append_properties(offsets_len, offsets, values_len, values, properties_offsets_len, properties_offsets, properties_len, properties)
+
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, likes)
+    let (created_at: felt, creator: felt, content: felt) = Comment_readMeta(contract, token_id)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, created_at)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, creator)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, content)
+
+    let (liked_by_count: felt) = indexed_set_length('comment_liked_by', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, liked_by_count)
+    let (disliked_by_count: felt) = indexed_set_length('comment_disliked_by', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, disliked_by_count)
+
+    let (offsets_len, values_len) = Comment_serializeComments(contract, names, token_ids_len - 1, token_ids + 1, offsets_len, offsets, values_len, values)
+
+    return (offsets_len, values_len)
+end
+
+# Comments created before the packed records keep their counters as IStorage
+# properties, which are read until the comment is written or migrated.
+func Comment_readLikes{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_id : Uint256) -> (
+    likes: felt):
+    alloc_locals
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (packed: felt) = comment_stats.read(token_id_felt)
+    if packed == 0:
+        let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
+        return (likes)
+    end
+
+    let (likes: felt, _, _) = unpack_lanes(packed)
+    return (likes - LIKES_BIAS)
+end
+
+func Comment_readMeta{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_id : Uint256) -> (
+    created_at: felt,
+    creator: felt,
+    content: felt):
+    alloc_locals
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (packed: felt) = comment_meta.read(token_id_felt)
+    if packed == 0:
+        let (created_at: felt) = IStorage.getPropertyFelt(contract, 'created_at', token_id)
+        let (creator: felt) = IStorage.getPropertyFelt(contract, 'creator', token_id)
+        let (content: felt) = IStorage.getPropertyFelt(contract, 'content', token_id)
+        return (created_at, creator, content)
+    end
+
+    let (created_at: felt, _, _) = unpack_lanes(packed)
+    let (creator: felt) = comment_creator.read(token_id_felt)
+    let (content: felt) = comment_content.read(token_id_felt)
+    return (created_at, creator, content)
 end
 
 
@@ -93,47 +274,40 @@ func Comment_createComment{
     inputs[1] = nonce
     verify_inputs_by_signature(caller, 2, inputs)
 
+    let (token_id: Uint256) = _Comment_createComment(caller, comment_len, comment, creator, content)
+    return (token_id)
+end
+
+func _Comment_createComment{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    owner: felt,
+    comment_len: felt,
+    comment: felt*,
+    creator: felt,
+    content: felt) -> (token_id: Uint256):
+    alloc_locals
+
     let (counter) = comment_counter.read()
     let (contract) = comment_contract.read()
     let (timestamp) = get_block_timestamp()
     let token_id: Uint256 = felt_to_Uint256(counter + 1)
 
-    IERC721.mint(contract, caller, token_id)
+    IERC721.mint(contract, owner, token_id)
 
     let (local names: felt*) = alloc()
     assert [names] = 'comment'
-    assert [names + 1] = 'created_at'
-    assert [names + 2] = 'creator'
-    assert [names + 3] = 'likes'
-    assert [names + 4] = 'content'
 
     let (local offsets: felt*) = alloc()
     assert [offsets] = comment_len
-    assert [offsets + 1] = offsets[0] + 1
-    assert [offsets + 2] = offsets[1] + 1
-    assert [offsets + 3] = offsets[2] + 1
-    assert [offsets + 4] = offsets[3] + 1
-
-    let (local timestamp_arr: felt*) = alloc()
-    assert [timestamp_arr] = timestamp
 
-    let (local creator_arr: felt*) = alloc()
-    assert [creator_arr] = creator
-
-    let (local content_arr: felt*) = alloc()
-    assert [content_arr] = content
-
-    let (local empty_arr: felt*) = alloc()
-    assert [empty_arr] = 0
-
-    let (values_len, values) = concat_arr(comment_len, comment, 1, timestamp_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, creator_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, empty_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, content_arr)
-
-    IStorage.setProperties(contract, 5, names, token_id, 5, offsets, values_len, values)
+    IStorage.setProperties(contract, 1, names, token_id, 1, offsets, comment_len, comment)
+    Comment_writeLikes(counter + 1, 0)
+    Comment_writeMeta(counter + 1, timestamp, creator, content)
 
     comment_counter.write(counter + 1)
+    CommentCreated.emit(counter + 1, content, creator, timestamp)
     return (token_id)
 end
 
@@ -152,29 +326,42 @@ func Comment_like{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
+    _Comment_like(token_id, user_token_id)
+
+    return ()
+end
+
+func _Comment_like{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    user_token_id: Uint256):
+    alloc_locals
+
     let (contract) = comment_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    assert_array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
-    assert liked_by[liked_by_len] = user_token_id_felt
-    IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len + 1, liked_by)
+    indexed_set_add('comment_liked_by', token_id_felt, user_token_id_felt)
 
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    let (includes: felt) = array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    let (includes: felt) = indexed_set_includes('comment_disliked_by', token_id_felt, user_token_id_felt)
     if includes == 1:
-        array_remove_element(disliked_by_len, disliked_by, user_token_id_felt)
-        IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len - 1, disliked_by)
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 2)
+        indexed_set_remove('comment_disliked_by', token_id_felt, user_token_id_felt)
+        Comment_writeLikes(token_id_felt, likes + 2)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     else:
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 1)
+        Comment_writeLikes(token_id_felt, likes + 1)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     end
 
+    CommentLiked.emit(token_id_felt, user_token_id_felt)
+
     return ()
 end
 
@@ -194,15 +381,13 @@ func Comment_remove_like{
     verify_inputs_by_signature(caller, 1, inputs)
 
     let (contract) = comment_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    assert_array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
-    array_remove_element(liked_by_len, liked_by, user_token_id_felt)
-    IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len - 1, liked_by)
+    indexed_set_remove('comment_liked_by', token_id_felt, user_token_id_felt)
     
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 1)
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    Comment_writeLikes(token_id_felt, likes - 1)
 
     return ()
 end
@@ -222,29 +407,42 @@ func Comment_dislike{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
+    _Comment_dislike(token_id, user_token_id)
+
+    return ()
+end
+
+func _Comment_dislike{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    user_token_id: Uint256):
+    alloc_locals
+
     let (contract) = comment_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    assert_array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
-    assert disliked_by[disliked_by_len] = user_token_id_felt
-    IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len + 1, disliked_by)
+    indexed_set_add('comment_disliked_by', token_id_felt, user_token_id_felt)
 
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    let (includes: felt) = array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    let (includes: felt) = indexed_set_includes('comment_liked_by', token_id_felt, user_token_id_felt)
     if includes == 1:
-        array_remove_element(liked_by_len, liked_by, user_token_id_felt)
-        IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len - 1, liked_by)
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 2)
+        indexed_set_remove('comment_liked_by', token_id_felt, user_token_id_felt)
+        Comment_writeLikes(token_id_felt, likes - 2)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     else:
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 1)
+        Comment_writeLikes(token_id_felt, likes - 1)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     end
 
+    CommentDisliked.emit(token_id_felt, user_token_id_felt)
+
     return ()
 end
 
@@ -264,20 +462,97 @@ func Comment_remove_dislike{
     verify_inputs_by_signature(caller, 1, inputs)
 
     let (contract) = comment_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    assert_array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
-    array_remove_element(disliked_by_len, disliked_by, user_token_id_felt)
-    IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len - 1, disliked_by)
+    indexed_set_remove('comment_disliked_by', token_id_felt, user_token_id_felt)
     
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 1)
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    Comment_writeLikes(token_id_felt, likes + 1)
 
     return ()
 end
 
 
+func Comment_writeLikes{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : felt,
+    likes : felt):
+
+    let (packed: felt) = pack_lanes(likes + LIKES_BIAS, 0, 0)
+    comment_stats.write(token_id, packed)
+
+    return ()
+end
+
+func Comment_writeMeta{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : felt,
+    created_at : felt,
+    creator : felt,
+    content : felt):
+
+    let (packed: felt) = pack_lanes(created_at, 0, 0)
+    comment_meta.write(token_id, packed)
+    comment_creator.write(token_id, creator)
+    comment_content.write(token_id, content)
+
+    return ()
+end
+
+# Copies the counters of comments created before the packed records into them.
+func Comment_migrateCounters{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = comment_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (likes: felt) = Comment_readLikes(contract, token_id)
+    Comment_writeLikes(token_ids[0], likes)
+    let (created_at: felt, creator: felt, content: felt) = Comment_readMeta(contract, token_id)
+    Comment_writeMeta(token_ids[0], created_at, creator, content)
+
+    Comment_migrateCounters(token_ids_len - 1, token_ids + 1)
+
+    return ()
+end
+
+# Moves the liked_by and disliked_by arrays of comments created before the
+# indexed sets into them.
+func Comment_migrateSets{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = comment_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    migrate_property_array(contract, 'liked_by', token_id, 'comment_liked_by', token_ids[0])
+    migrate_property_array(contract, 'disliked_by', token_id, 'comment_disliked_by', token_ids[0])
+
+    Comment_migrateSets(token_ids_len - 1, token_ids + 1)
+
+    return ()
+end
+
 func Comment_setContract{
     syscall_ptr : felt*,
     ecdsa_ptr : SignatureBuiltin*,
@@ -4,15 +4,20 @@ from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.cairo_builtins import HashBuiltin, SignatureBuiltin
 from starkware.starknet.common.syscalls import get_tx_signature, get_contract_address, get_block_timestamp, get_caller_address
 from starkware.cairo.common.uint256 import Uint256, uint256_eq
-from starkware.cairo.common.math import assert_nn
+from starkware.cairo.common.math import assert_nn, assert_nn_le, assert_not_zero, assert_le
 
-from utils.Array import concat_arr, assert_array_includes, array_remove_element, array_includes
-from utils.DecentralMediaHelper import deserialize, Array, Uint256_to_felt, felt_to_Uint256
+from utils.Array import concat_arr
+from utils.DecentralMediaHelper import deserialize, append_properties, append_felt, Array, Uint256_to_felt, felt_to_Uint256, normalize_tag, pack_lanes, unpack_lanes, LIKES_BIAS, migrate_property_array
+from utils.IndexedSet import indexed_set_length, indexed_set_includes, indexed_set_add, indexed_set_remove, indexed_set_read
 from utils.utils import verify_inputs_by_signature
 from starknet_erc721_storage.IStorage import IStorage
 from IERC721 import IERC721
 
 
+# Views fit a signed 64 bit integer, so that indexers can keep them in
+# SQLite INTEGER columns.
+const MAX_VIEWS = 2 ** 63 - 1
+
 #
 # Storage
 #
@@ -25,6 +30,46 @@ end
 func content_counter() -> (token_id : felt):
 end
 
+# Packed likes, views and public.
+@storage_var
+func content_stats(token_id : felt) -> (packed : felt):
+end
+
+# Packed created_at. The creator is a token id, which does not fit a lane
+# (tokens minted before felt_to_Uint256 was fixed have ids n * 2**128).
+@storage_var
+func content_meta(token_id : felt) -> (packed : felt):
+end
+
+@storage_var
+func content_creator(token_id : felt) -> (creator : felt):
+end
+
+
+#
+# Events
+#
+
+@event
+func ContentCreated(token_id : felt, creator : felt, public : felt, created_at : felt):
+end
+
+@event
+func ContentUpdated(token_id : felt, public : felt):
+end
+
+@event
+func ContentLiked(token_id : felt, user_token_id : felt):
+end
+
+@event
+func ContentDisliked(token_id : felt, user_token_id : felt):
+end
+
+@event
+func ContentViewsRecorded(token_id : felt, count : felt):
+end
+
 
 #
 # Getters
@@ -56,36 +101,237 @@ func Content_getContent{
 
     let (contract) = content_contract.read()
 
-    let (views: felt) = IStorage.getPropertyFelt(contract, 'views', token_id)
-    IStorage.setPropertyFelt(contract, 'views', token_id, views + 1)
-
     let names : felt* = alloc()
     assert [names] = 'content'
     assert [names + 1] = 'tags'
     assert [names + 2] = 'authors'
-    assert [names + 3] = 'comments'
-    assert [names + 4] = 'liked_by'
-    assert [names + 5] = 'disliked_by'
-    assert [names + 6] = 'likes'
-    assert [names + 7] = 'views'
-    assert [names + 8] = 'public'
-    assert [names + 9] = 'created_at'
-    assert [names + 10] = 'creator'
-
-    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 11, names, token_id)
+
+    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 3, names, token_id)
     let (data_len: felt, data: Array*) = deserialize(offsets_len, offsets, properties_len, properties)
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    let (created_at: felt, creator: felt) = Content_readMeta(contract, token_id)
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (comments_len: felt) = indexed_set_length('content_comments', token_id_felt)
+    let (comments_len: felt, comments: felt*) = indexed_set_read('content_comments', token_id_felt, 0, comments_len)
+    let (liked_by_len: felt) = indexed_set_length('content_liked_by', token_id_felt)
+    let (liked_by_len: felt, liked_by: felt*) = indexed_set_read('content_liked_by', token_id_felt, 0, liked_by_len)
+    let (disliked_by_len: felt) = indexed_set_length('content_disliked_by', token_id_felt)
+    let (disliked_by_len: felt, disliked_by: felt*) = indexed_set_read('content_disliked_by', token_id_felt, 0, disliked_by_len)
 
     return (data[0].len, data[0].arr,
             data[1].len, data[1].arr,
             data[2].len, data[2].arr,
-            data[3].len, data[3].arr,
-            data[4].len, data[4].arr,
-            data[5].len, data[5].arr,
-            data[6].arr[0],
-            data[7].arr[0],
-            data[8].arr[0],
-            data[9].arr[0],
-            data[10].arr[0])
+            comments_len, comments,
+            liked_by_len, liked_by,
+            disliked_by_len, disliked_by,
+            likes,
+            views,
+            public,
+            created_at,
+            creator)
+end
+
+func Content_getHeader{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256) -> (
+    comments_count: felt,
+    liked_by_count: felt,
+    disliked_by_count: felt,
+    likes: felt,
+    views: felt,
+    public: felt,
+    created_at: felt,
+    creator: felt):
+    alloc_locals
+
+    let (contract) = content_contract.read()
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    let (created_at: felt, creator: felt) = Content_readMeta(contract, token_id)
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (comments_count: felt) = indexed_set_length('content_comments', token_id_felt)
+    let (liked_by_count: felt) = indexed_set_length('content_liked_by', token_id_felt)
+    let (disliked_by_count: felt) = indexed_set_length('content_disliked_by', token_id_felt)
+
+    return (comments_count, liked_by_count, disliked_by_count, likes, views, public, created_at, creator)
+end
+
+func Content_getComments{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    comments_len: felt,
+    comments: felt*):
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (comments_len: felt, comments: felt*) = indexed_set_read('content_comments', token_id_felt, offset, limit)
+    return (comments_len, comments)
+end
+
+func Content_getLikedBy{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    liked_by_len: felt,
+    liked_by: felt*):
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (liked_by_len: felt, liked_by: felt*) = indexed_set_read('content_liked_by', token_id_felt, offset, limit)
+    return (liked_by_len, liked_by)
+end
+
+func Content_getDislikedBy{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    disliked_by_len: felt,
+    disliked_by: felt*):
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (disliked_by_len: felt, disliked_by: felt*) = indexed_set_read('content_disliked_by', token_id_felt, offset, limit)
+    return (disliked_by_len, disliked_by)
+end
+
+func Content_getContentsByTag{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    tag : felt,
+    offset : felt,
+    limit : felt) -> (
+    token_ids_len: felt,
+    token_ids: felt*):
+    let (normalized_tag: felt) = normalize_tag(tag)
+    let (token_ids_len: felt, token_ids: felt*) = indexed_set_read('tag_contents', normalized_tag, offset, limit)
+    return (token_ids_len, token_ids)
+end
+
+func Content_getContents{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    alloc_locals
+
+    let (contract) = content_contract.read()
+
+    let (local names : felt*) = alloc()
+    assert [names] = 'content'
+    assert [names + 1] = 'tags'
+    assert [names + 2] = 'authors'
+
+    let (local offsets : felt*) = alloc()
+    let (local values : felt*) = alloc()
+    let (offsets_len, values_len) = Content_serializeContents(contract, names, token_ids_len, token_ids, 0, offsets, 0, values)
+
+    return (offsets_len, offsets, values_len, values)
+end
+
+func Content_serializeContents{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    names : felt*,
+    token_ids_len : felt,
+    token_ids : felt*,
+    offsets_len : felt,
+    offsets : felt*,
+    values_len : felt,
+    values : felt*) -> (
+    offsets_len: felt,
+    values_len: felt):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return (offsets_len, values_len)
+    end
+
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (properties_offsets_len, properties_offsets, properties_len, properties) = IStorage.getProperties(contract, 3, names, token_id)
+    let (offsets_len, values_len) = append_properties(offsets_len, offsets, values_len, values, properties_offsets_len, properties_offsets, properties_len, properties)
+
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, likes)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, views)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, public)
+    let (created_at: felt, creator: felt) = Content_readMeta(contract, token_id)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, created_at)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, creator)
+
+    let (comments_count: felt) = indexed_set_length('content_comments', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, comments_count)
+    let (liked_by_count: felt) = indexed_set_length('content_liked_by', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, liked_by_count)
+    let (disliked_by_count: felt) = indexed_set_length('content_disliked_by', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, disliked_by_count)
+
+    let (offsets_len, values_len) = Content_serializeContents(contract, names, token_ids_len - 1, token_ids + 1, offsets_len, offsets, values_len, values)
+
+    return (offsets_len, values_len)
+end
+
+# Contents created before the packed records keep their counters as IStorage
+# properties, which are read until the content is written or migrated.
+func Content_readStats{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_id : Uint256) -> (
+    likes: felt,
+    views: felt,
+    public: felt):
+    alloc_locals
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (packed: felt) = content_stats.read(token_id_felt)
+    if packed == 0:
+        let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
+        let (views: felt) = IStorage.getPropertyFelt(contract, 'views', token_id)
+        let (public: felt) = IStorage.getPropertyFelt(contract, 'public', token_id)
+        return (likes, views, public)
+    end
+
+    let (likes: felt, views: felt, public: felt) = unpack_lanes(packed)
+    return (likes - LIKES_BIAS, views, public)
+end
+
+func Content_readMeta{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_id : Uint256) -> (
+    created_at: felt,
+    creator: felt):
+    alloc_locals
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (packed: felt) = content_meta.read(token_id_felt)
+    if packed == 0:
+        let (created_at: felt) = IStorage.getPropertyFelt(contract, 'created_at', token_id)
+        let (creator: felt) = IStorage.getPropertyFelt(contract, 'creator', token_id)
+        return (created_at, creator)
+    end
+
+    let (created_at: felt, _, _) = unpack_lanes(packed)
+    let (creator: felt) = content_creator.read(token_id_felt)
+    return (created_at, creator)
 end
 
 
@@ -117,6 +363,7 @@ func Content_createContent{
     inputs[3] = public
     inputs[4] = nonce
     verify_inputs_by_signature(caller, 5, inputs)
+    assert public * (public - 1) = 0
 
     let (counter) = content_counter.read()
     let (contract) = content_contract.read()
@@ -125,49 +372,28 @@ func Content_createContent{
 
     IERC721.mint(contract, caller, token_id)
 
+    let (local normalized_tags: felt*) = alloc()
+    let (local normalized_tags_len: felt) = Content_addTags(counter + 1, tags_len, tags, normalized_tags)
+
     let (local names: felt*) = alloc()
     assert [names] = 'content'
     assert [names + 1] = 'tags'
     assert [names + 2] = 'authors'
-    assert [names + 3] = 'public'
-    assert [names + 4] = 'created_at'
-    assert [names + 5] = 'creator'
-    assert [names + 6] = 'likes'
-    assert [names + 7] = 'views'
 
     let (local offsets: felt*) = alloc()
     assert [offsets] = content_len
-    assert [offsets + 1] = offsets[0] + tags_len
+    assert [offsets + 1] = offsets[0] + normalized_tags_len
     assert [offsets + 2] = offsets[1] + authors_len
-    assert [offsets + 3] = offsets[2] + 1
-    assert [offsets + 4] = offsets[3] + 1
-    assert [offsets + 5] = offsets[4] + 1
-    assert [offsets + 6] = offsets[5] + 1
-    assert [offsets + 7] = offsets[6] + 1
-
-    let (local public_arr: felt*) = alloc()
-    assert [public_arr] = public
 
-    let (local timestamp_arr: felt*) = alloc()
-    assert [timestamp_arr] = timestamp
-
-    let (local creator_arr: felt*) = alloc()
-    assert [creator_arr] = creator
-
-    let (local empty_arr: felt*) = alloc()
-    assert [empty_arr] = 0
-
-    let (values_len, values) = concat_arr(content_len, content, tags_len, tags)
+    let (values_len, values) = concat_arr(content_len, content, normalized_tags_len, normalized_tags)
     let (values_len, values) = concat_arr(values_len, values, authors_len, authors)
-    let (values_len, values) = concat_arr(values_len, values, 1, public_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, timestamp_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, creator_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, empty_arr)
-    let (values_len, values) = concat_arr(values_len, values, 1, empty_arr)
 
-    IStorage.setProperties(contract, 8, names, token_id, 8, offsets, values_len, values)
+    IStorage.setProperties(contract, 3, names, token_id, 3, offsets, values_len, values)
+    Content_writeStats(counter + 1, 0, 0, public)
+    Content_writeMeta(counter + 1, timestamp, creator)
 
     content_counter.write(counter + 1)
+    ContentCreated.emit(counter + 1, creator, public, timestamp)
     return (token_id)
 end
 
@@ -177,23 +403,104 @@ func Content_updateContent{
     pedersen_ptr : HashBuiltin*,
     range_check_ptr}(
     token_id: Uint256,
+    editor: felt,
     public: felt,
+    tags_len: felt,
+    tags: felt*,
     nonce: felt):
     alloc_locals
 
     let (caller) = get_caller_address()
     let inputs : felt* = alloc()
     inputs[0] = public
-    inputs[1] = nonce
-    verify_inputs_by_signature(caller, 2, inputs)
+    inputs[1] = tags_len
+    inputs[2] = nonce
+    verify_inputs_by_signature(caller, 3, inputs)
+    assert public * (public - 1) = 0
 
     let (contract) = content_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+
+    # Only minted contents can be updated, and only by their creator.
+    let (counter) = content_counter.read()
+    assert_not_zero(token_id_felt)
+    assert_le(token_id_felt, counter)
+    let (_, creator: felt) = Content_readMeta(contract, token_id)
+    assert creator = editor
+
+    let (likes: felt, views: felt, _) = Content_readStats(contract, token_id)
+    Content_writeStats(token_id_felt, likes, views, public)
+
+    let (old_tags_len: felt, old_tags: felt*) = IStorage.getPropertyArray(contract, 'tags', token_id)
+    Content_removeTags(token_id_felt, old_tags_len, old_tags)
+    let (local normalized_tags: felt*) = alloc()
+    let (normalized_tags_len: felt) = Content_addTags(token_id_felt, tags_len, tags, normalized_tags)
+    IStorage.setPropertyArray(contract, 'tags', token_id, normalized_tags_len, normalized_tags)
 
-    IStorage.setPropertyFelt(contract, 'public', token_id, public)
+    ContentUpdated.emit(token_id_felt, public)
 
     return ()
 end
 
+# Normalizes tags into normalized_tags, skipping duplicates, and adds the
+# content to the index of every tag.
+func Content_addTags{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: felt,
+    tags_len: felt,
+    tags: felt*,
+    normalized_tags: felt*) -> (normalized_tags_len: felt):
+    alloc_locals
+
+    if tags_len == 0:
+        return (0)
+    end
+
+    let (local tag: felt) = normalize_tag([tags])
+    let (includes: felt) = indexed_set_includes('tag_contents', tag, token_id)
+    if includes == 1:
+        let (normalized_tags_len: felt) = Content_addTags(token_id, tags_len - 1, tags + 1, normalized_tags)
+        return (normalized_tags_len)
+    end
+
+    indexed_set_add('tag_contents', tag, token_id)
+    assert [normalized_tags] = tag
+    let (normalized_tags_len: felt) = Content_addTags(token_id, tags_len - 1, tags + 1, normalized_tags + 1)
+    return (normalized_tags_len + 1)
+end
+
+# Tags of contents created before the tag index are not indexed and skipped.
+func Content_removeTags{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: felt,
+    tags_len: felt,
+    tags: felt*):
+    alloc_locals
+
+    if tags_len == 0:
+        return ()
+    end
+
+    let (includes: felt) = indexed_set_includes('tag_contents', [tags], token_id)
+    if includes == 1:
+        indexed_set_remove('tag_contents', [tags], token_id)
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    end
+
+    Content_removeTags(token_id, tags_len - 1, tags + 1)
+    return ()
+end
+
 func Content_updateComments{
     syscall_ptr : felt*,
     pedersen_ptr : HashBuiltin*,
@@ -202,12 +509,9 @@ func Content_updateComments{
     comment_token_id: Uint256):
     alloc_locals
 
-    let (contract) = content_contract.read()
-
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (comment_token_id_felt: felt) = Uint256_to_felt(comment_token_id)
-    let (comments_len: felt, comments: felt*) = IStorage.getPropertyArray(contract, 'comments', token_id)
-    assert comments[comments_len] = comment_token_id_felt
-    IStorage.setPropertyArray(contract, 'comments', token_id, comments_len + 1, comments)
+    indexed_set_add('content_comments', token_id_felt, comment_token_id_felt)
 
     return ()
 end
@@ -227,29 +531,42 @@ func Content_like{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
+    _Content_like(token_id, user_token_id)
+
+    return ()
+end
+
+func _Content_like{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    user_token_id: Uint256):
+    alloc_locals
+
     let (contract) = content_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    assert_array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
-    assert liked_by[liked_by_len] = user_token_id_felt
-    IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len + 1, liked_by)
+    indexed_set_add('content_liked_by', token_id_felt, user_token_id_felt)
 
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    let (includes: felt) = array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    let (includes: felt) = indexed_set_includes('content_disliked_by', token_id_felt, user_token_id_felt)
     if includes == 1:
-        array_remove_element(disliked_by_len, disliked_by, user_token_id_felt)
-        IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len - 1, disliked_by)
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 2)
+        indexed_set_remove('content_disliked_by', token_id_felt, user_token_id_felt)
+        Content_writeStats(token_id_felt, likes + 2, views, public)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     else:
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 1)
+        Content_writeStats(token_id_felt, likes + 1, views, public)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     end
 
+    ContentLiked.emit(token_id_felt, user_token_id_felt)
+
     return ()
 end
 
@@ -269,15 +586,13 @@ func Content_remove_like{
     verify_inputs_by_signature(caller, 1, inputs)
 
     let (contract) = content_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    assert_array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
-    array_remove_element(liked_by_len, liked_by, user_token_id_felt)
-    IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len - 1, liked_by)
+    indexed_set_remove('content_liked_by', token_id_felt, user_token_id_felt)
     
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 1)
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    Content_writeStats(token_id_felt, likes - 1, views, public)
 
     return ()
 end
@@ -297,29 +612,42 @@ func Content_dislike{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
+    _Content_dislike(token_id, user_token_id)
+
+    return ()
+end
+
+func _Content_dislike{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    user_token_id: Uint256):
+    alloc_locals
+
     let (contract) = content_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    assert_array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
-    assert disliked_by[disliked_by_len] = user_token_id_felt
-    IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len + 1, disliked_by)
+    indexed_set_add('content_disliked_by', token_id_felt, user_token_id_felt)
 
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    let (liked_by_len: felt, liked_by: felt*) = IStorage.getPropertyArray(contract, 'liked_by', token_id)
-    let (includes: felt) = array_includes(liked_by_len, liked_by, user_token_id_felt, 1)
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    let (includes: felt) = indexed_set_includes('content_liked_by', token_id_felt, user_token_id_felt)
     if includes == 1:
-        array_remove_element(liked_by_len, liked_by, user_token_id_felt)
-        IStorage.setPropertyArray(contract, 'liked_by', token_id, liked_by_len - 1, liked_by)
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 2)
+        indexed_set_remove('content_liked_by', token_id_felt, user_token_id_felt)
+        Content_writeStats(token_id_felt, likes - 2, views, public)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     else:
-        IStorage.setPropertyFelt(contract, 'likes', token_id, likes - 1)
+        Content_writeStats(token_id_felt, likes - 1, views, public)
         tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
         tempvar range_check_ptr = range_check_ptr
     end
 
+    ContentDisliked.emit(token_id_felt, user_token_id_felt)
+
     return ()
 end
 
@@ -339,15 +667,144 @@ func Content_remove_dislike{
     verify_inputs_by_signature(caller, 1, inputs)
 
     let (contract) = content_contract.read()
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (user_token_id_felt: felt) = Uint256_to_felt(user_token_id)
 
-    let (disliked_by_len: felt, disliked_by: felt*) = IStorage.getPropertyArray(contract, 'disliked_by', token_id)
-    assert_array_includes(disliked_by_len, disliked_by, user_token_id_felt, 1)
-    array_remove_element(disliked_by_len, disliked_by, user_token_id_felt)
-    IStorage.setPropertyArray(contract, 'disliked_by', token_id, disliked_by_len - 1, disliked_by)
+    indexed_set_remove('content_disliked_by', token_id_felt, user_token_id_felt)
     
-    let (likes: felt) = IStorage.getPropertyFelt(contract, 'likes', token_id)
-    IStorage.setPropertyFelt(contract, 'likes', token_id, likes + 1)
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    Content_writeStats(token_id_felt, likes + 1, views, public)
+
+    return ()
+end
+
+func Content_recordViews{
+    syscall_ptr : felt*,
+    ecdsa_ptr : SignatureBuiltin*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    adm : felt,
+    token_ids_len : felt,
+    token_ids : felt*,
+    counts_len : felt,
+    counts : felt*,
+    nonce : felt):
+    alloc_locals
+
+    assert token_ids_len = counts_len
+
+    let (inputs_len, inputs) = concat_arr(token_ids_len, token_ids, counts_len, counts)
+    assert inputs[inputs_len] = nonce
+    verify_inputs_by_signature(adm, inputs_len + 1, inputs)
+
+    let (contract) = content_contract.read()
+    Content_addViews(contract, token_ids_len, token_ids, counts)
+
+    return ()
+end
+
+func Content_addViews{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_ids_len : felt,
+    token_ids : felt*,
+    counts : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    assert_nn(counts[0])
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    assert_nn_le(views + counts[0], MAX_VIEWS)
+    Content_writeStats(token_ids[0], likes, views + counts[0], public)
+    ContentViewsRecorded.emit(token_ids[0], counts[0])
+
+    Content_addViews(contract, token_ids_len - 1, token_ids + 1, counts + 1)
+
+    return ()
+end
+
+func Content_writeStats{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : felt,
+    likes : felt,
+    views : felt,
+    public : felt):
+
+    let (packed: felt) = pack_lanes(likes + LIKES_BIAS, views, public)
+    content_stats.write(token_id, packed)
+
+    return ()
+end
+
+func Content_writeMeta{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : felt,
+    created_at : felt,
+    creator : felt):
+
+    let (packed: felt) = pack_lanes(created_at, 0, 0)
+    content_meta.write(token_id, packed)
+    content_creator.write(token_id, creator)
+
+    return ()
+end
+
+# Copies the counters of contents created before the packed records into them.
+func Content_migrateCounters{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = content_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (likes: felt, views: felt, public: felt) = Content_readStats(contract, token_id)
+    Content_writeStats(token_ids[0], likes, views, public)
+    let (created_at: felt, creator: felt) = Content_readMeta(contract, token_id)
+    Content_writeMeta(token_ids[0], created_at, creator)
+
+    Content_migrateCounters(token_ids_len - 1, token_ids + 1)
+
+    return ()
+end
+
+# Moves the liked_by, disliked_by and comments arrays of contents created
+# before the indexed sets into them.
+func Content_migrateSets{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = content_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    migrate_property_array(contract, 'liked_by', token_id, 'content_liked_by', token_ids[0])
+    migrate_property_array(contract, 'disliked_by', token_id, 'content_disliked_by', token_ids[0])
+    migrate_property_array(contract, 'comments', token_id, 'content_comments', token_ids[0])
+
+    Content_migrateSets(token_ids_len - 1, token_ids + 1)
 
     return ()
 end
@@ -4,41 +4,70 @@
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.cairo_builtins import HashBuiltin, SignatureBuiltin
 from starkware.cairo.common.uint256 import Uint256
-from starkware.cairo.common.math import assert_not_zero
+from starkware.cairo.common.math import assert_not_zero, assert_nn
+from starkware.cairo.common.memcpy import memcpy
 from starkware.starknet.common.syscalls import get_caller_address
 
 from utils.utils import verify_inputs_by_signature
-from utils.DecentralMediaHelper import Uint256_to_felt
+from utils.DecentralMediaHelper import Uint256_to_felt, felt_to_Uint256
 
 from UserFunctions import (
     User_getUserTokenId,
     User_getIsFlaged,
     User_getUser,
+    User_getFollowing,
+    User_getFollowers,
+    User_getContents,
+    User_getUsers,
     User_createUser,
     User_updateUser,
     User_updateContents,
     User_follow,
+    _User_follow,
     User_unfollow,
+    _User_unfollow,
     User_rate,
+    _User_rate,
+    User_migrateCounters,
+    User_migrateSets,
     User_setContract,
     User_flag
 )
 
 from ContentFunctions import (
     Content_getContent,
+    Content_getHeader,
+    Content_getComments,
+    Content_getLikedBy,
+    Content_getDislikedBy,
+    Content_getContents,
+    Content_getContentsByTag,
     Content_createContent,
     Content_updateContent,
     Content_updateComments,
     Content_like,
+    _Content_like,
     Content_dislike,
+    _Content_dislike,
+    Content_recordViews,
+    Content_migrateCounters,
+    Content_migrateSets,
     Content_setContract,
 )
 
 from CommentFunctions import (
     Comment_getComment,
+    Comment_getLikedBy,
+    Comment_getDislikedBy,
+    Comment_getComments,
     Comment_createComment,
+    _Comment_createComment,
     Comment_like,
+    _Comment_like,
     Comment_dislike,
+    _Comment_dislike,
+    Comment_migrateCounters,
+    Comment_migrateSets,
     Comment_setContract,
 )
 
@@ -124,6 +153,63 @@ func get_user{
     return (username_len, username, image_len, image, background_image_len, background_image, description_len, description, social_link_len, social_link, following_len, following, followers_len, followers, contents_len, contents, rated_len, rated, rating_len, rating, created_at)
 end
 
+@view
+func get_user_following{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    following_len: felt,
+    following: felt*):
+    let (following_len: felt, following: felt*) = User_getFollowing(address, offset, limit)
+    return (following_len, following)
+end
+
+@view
+func get_user_followers{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    followers_len: felt,
+    followers: felt*):
+    let (followers_len: felt, followers: felt*) = User_getFollowers(address, offset, limit)
+    return (followers_len, followers)
+end
+
+@view
+func get_user_contents{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    contents_len: felt,
+    contents: felt*):
+    let (contents_len: felt, contents: felt*) = User_getContents(address, offset, limit)
+    return (contents_len, contents)
+end
+
+@view
+func get_users{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    let (offsets_len: felt, offsets: felt*, values_len: felt, values: felt*) = User_getUsers(token_ids_len, token_ids)
+    return (offsets_len, offsets, values_len, values)
+end
+
 @view
 func get_content{
     syscall_ptr : felt*,
@@ -163,6 +249,104 @@ func get_content{
     return (content_len, content, tags_len, tags, authors_len, authors, comments_len, comments, liked_by_len, liked_by, disliked_by_len, disliked_by, likes, views, public, created_at, creator)
 end
 
+@view
+func get_content_header{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256) -> (
+    comments_count: felt,
+    liked_by_count: felt,
+    disliked_by_count: felt,
+    likes: felt,
+    views: felt,
+    public: felt,
+    created_at: felt,
+    creator: felt):
+
+    let (comments_count: felt,
+    liked_by_count: felt,
+    disliked_by_count: felt,
+    likes: felt,
+    views: felt,
+    public: felt,
+    created_at: felt,
+    creator: felt) = Content_getHeader(token_id)
+
+    return (comments_count, liked_by_count, disliked_by_count, likes, views, public, created_at, creator)
+end
+
+@view
+func get_content_comments{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    comments_len: felt,
+    comments: felt*):
+    let (comments_len: felt, comments: felt*) = Content_getComments(token_id, offset, limit)
+    return (comments_len, comments)
+end
+
+@view
+func get_content_liked_by{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    liked_by_len: felt,
+    liked_by: felt*):
+    let (liked_by_len: felt, liked_by: felt*) = Content_getLikedBy(token_id, offset, limit)
+    return (liked_by_len, liked_by)
+end
+
+@view
+func get_content_disliked_by{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    disliked_by_len: felt,
+    disliked_by: felt*):
+    let (disliked_by_len: felt, disliked_by: felt*) = Content_getDislikedBy(token_id, offset, limit)
+    return (disliked_by_len, disliked_by)
+end
+
+@view
+func get_contents{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    let (offsets_len: felt, offsets: felt*, values_len: felt, values: felt*) = Content_getContents(token_ids_len, token_ids)
+    return (offsets_len, offsets, values_len, values)
+end
+
+@view
+func get_contents_by_tag{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    tag : felt,
+    offset : felt,
+    limit : felt) -> (
+    token_ids_len: felt,
+    token_ids: felt*):
+    let (token_ids_len: felt, token_ids: felt*) = Content_getContentsByTag(tag, offset, limit)
+    return (token_ids_len, token_ids)
+end
+
 @view
 func get_comment{
     syscall_ptr : felt*,
@@ -191,6 +375,49 @@ func get_comment{
     return (comment_len, comment, liked_by_len, liked_by, disliked_by_len, disliked_by, likes, created_at, creator, content)
 end
 
+@view
+func get_comment_liked_by{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    liked_by_len: felt,
+    liked_by: felt*):
+    let (liked_by_len: felt, liked_by: felt*) = Comment_getLikedBy(token_id, offset, limit)
+    return (liked_by_len, liked_by)
+end
+
+@view
+func get_comment_disliked_by{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id : Uint256,
+    offset : felt,
+    limit : felt) -> (
+    disliked_by_len: felt,
+    disliked_by: felt*):
+    let (disliked_by_len: felt, disliked_by: felt*) = Comment_getDislikedBy(token_id, offset, limit)
+    return (disliked_by_len, disliked_by)
+end
+
+@view
+func get_comments{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    let (offsets_len: felt, offsets: felt*, values_len: felt, values: felt*) = Comment_getComments(token_ids_len, token_ids)
+    return (offsets_len, offsets, values_len, values)
+end
+
 #
 # Externals
 #
@@ -339,8 +566,17 @@ func update_content{
     range_check_ptr}(
     token_id: Uint256,
     public: felt,
+    tags_len: felt,
+    tags: felt*,
     nonce: felt):
-    Content_updateContent(token_id, public, nonce)
+    alloc_locals
+
+    let (caller) = get_caller_address()
+    let (editor_token_id: Uint256) = User_getUserTokenId(caller)
+    let (editor_token_id_felt: felt) = Uint256_to_felt(editor_token_id)
+    assert_not_zero(editor_token_id_felt)
+
+    Content_updateContent(token_id, editor_token_id_felt, public, tags_len, tags, nonce)
     return ()
 end
 
@@ -372,6 +608,88 @@ func dislike_content{
     return ()
 end
 
+@external
+func record_views{
+    syscall_ptr : felt*,
+    ecdsa_ptr : SignatureBuiltin*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*,
+    counts_len : felt,
+    counts : felt*,
+    nonce : felt):
+    let (adm) = admin.read()
+    Content_recordViews(adm, token_ids_len, token_ids, counts_len, counts, nonce)
+    return ()
+end
+
+@external
+func migrate_counters{
+    syscall_ptr : felt*,
+    ecdsa_ptr : SignatureBuiltin*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    kind : felt,
+    token_ids_len : felt,
+    token_ids : felt*,
+    nonce : felt):
+    alloc_locals
+
+    let (adm) = admin.read()
+    let (local inputs: felt*) = alloc()
+    assert [inputs] = kind
+    memcpy(inputs + 1, token_ids, token_ids_len)
+    assert inputs[1 + token_ids_len] = nonce
+    verify_inputs_by_signature(adm, token_ids_len + 2, inputs)
+
+    if kind == 'user':
+        User_migrateCounters(token_ids_len, token_ids)
+        return ()
+    end
+    if kind == 'content':
+        Content_migrateCounters(token_ids_len, token_ids)
+        return ()
+    end
+
+    assert kind = 'comment'
+    Comment_migrateCounters(token_ids_len, token_ids)
+    return ()
+end
+
+@external
+func migrate_sets{
+    syscall_ptr : felt*,
+    ecdsa_ptr : SignatureBuiltin*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    kind : felt,
+    token_ids_len : felt,
+    token_ids : felt*,
+    nonce : felt):
+    alloc_locals
+
+    let (adm) = admin.read()
+    let (local inputs: felt*) = alloc()
+    assert [inputs] = kind
+    memcpy(inputs + 1, token_ids, token_ids_len)
+    assert inputs[1 + token_ids_len] = nonce
+    verify_inputs_by_signature(adm, token_ids_len + 2, inputs)
+
+    if kind == 'user':
+        User_migrateSets(token_ids_len, token_ids)
+        return ()
+    end
+    if kind == 'content':
+        Content_migrateSets(token_ids_len, token_ids)
+        return ()
+    end
+
+    assert kind = 'comment'
+    Comment_migrateSets(token_ids_len, token_ids)
+    return ()
+end
+
 @external
 func set_comment_erc721_contract{
     syscall_ptr : felt*,
@@ -398,14 +716,7 @@ func create_comment{
     alloc_locals
 
     let (caller) = get_caller_address()
-    let (creator_token_id: Uint256) = User_getUserTokenId(caller)
-    
-    let (flaged) = User_getIsFlaged(creator_token_id)
-    assert flaged = 0
-
-    let (creator_token_id_felt: felt) = Uint256_to_felt(creator_token_id)
-    assert_not_zero(creator_token_id_felt)
-
+    let (creator_token_id_felt: felt) = get_comment_creator(caller)
     let (content_token_id_felt: felt) = Uint256_to_felt(content_token_id)
 
     let (token_id: Uint256) = Comment_createComment(comment_len, comment, creator_token_id_felt, content_token_id_felt, nonce)
@@ -453,4 +764,139 @@ func flag_user{
     let (adm) = admin.read()
     User_flag(adm, token_id, flag, nonce)
     return ()
-end
\ No newline at end of file
+end
+
+@external
+func batch_actions{
+    syscall_ptr : felt*,
+    ecdsa_ptr : SignatureBuiltin*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    action_types_len: felt,
+    action_types: felt*,
+    args_len: felt,
+    args: felt*,
+    nonce: felt):
+    alloc_locals
+
+    let (caller) = get_caller_address()
+    let (local inputs: felt*) = alloc()
+    assert [inputs] = action_types_len
+    memcpy(inputs + 1, action_types, action_types_len)
+    memcpy(inputs + 1 + action_types_len, args, args_len)
+    assert inputs[1 + action_types_len + args_len] = nonce
+    verify_inputs_by_signature(caller, action_types_len + args_len + 2, inputs)
+
+    let (user_token_id: Uint256) = User_getUserTokenId(caller)
+    execute_actions(caller, user_token_id, action_types_len, action_types, args_len, args)
+    return ()
+end
+
+#
+# Internals
+#
+
+const ACTION_FOLLOW = 1
+const ACTION_UNFOLLOW = 2
+const ACTION_RATE = 3
+const ACTION_LIKE_CONTENT = 4
+const ACTION_DISLIKE_CONTENT = 5
+const ACTION_LIKE_COMMENT = 6
+const ACTION_DISLIKE_COMMENT = 7
+const ACTION_CREATE_COMMENT = 8
+
+func get_comment_creator{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    caller: felt) -> (
+    creator_token_id: felt):
+    alloc_locals
+
+    let (creator_token_id: Uint256) = User_getUserTokenId(caller)
+
+    let (flaged) = User_getIsFlaged(creator_token_id)
+    assert flaged = 0
+
+    let (creator_token_id_felt: felt) = Uint256_to_felt(creator_token_id)
+    assert_not_zero(creator_token_id_felt)
+    return (creator_token_id_felt)
+end
+
+func execute_actions{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    caller: felt,
+    user_token_id: Uint256,
+    action_types_len: felt,
+    action_types: felt*,
+    args_len: felt,
+    args: felt*):
+    if action_types_len == 0:
+        assert args_len = 0
+        return ()
+    end
+
+    let (used_args_len) = execute_action(caller, user_token_id, [action_types], args_len, args)
+    execute_actions(caller, user_token_id, action_types_len - 1, action_types + 1, args_len - used_args_len, args + used_args_len)
+    return ()
+end
+
+# Runs a single action of a batch and returns how many felts of args it used.
+func execute_action{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    caller: felt,
+    user_token_id: Uint256,
+    action_type: felt,
+    args_len: felt,
+    args: felt*) -> (
+    used_args_len: felt):
+    alloc_locals
+
+    assert_nn(args_len - 1)
+    let (token_id: Uint256) = felt_to_Uint256(args[0])
+
+    if action_type == ACTION_FOLLOW:
+        _User_follow(user_token_id, token_id)
+        return (1)
+    end
+    if action_type == ACTION_UNFOLLOW:
+        _User_unfollow(user_token_id, token_id)
+        return (1)
+    end
+    if action_type == ACTION_RATE:
+        assert_nn(args_len - 2)
+        _User_rate(user_token_id, token_id, args[1])
+        return (2)
+    end
+    if action_type == ACTION_LIKE_CONTENT:
+        _Content_like(token_id, user_token_id)
+        return (1)
+    end
+    if action_type == ACTION_DISLIKE_CONTENT:
+        _Content_dislike(token_id, user_token_id)
+        return (1)
+    end
+    if action_type == ACTION_LIKE_COMMENT:
+        _Comment_like(token_id, user_token_id)
+        return (1)
+    end
+    if action_type == ACTION_DISLIKE_COMMENT:
+        _Comment_dislike(token_id, user_token_id)
+        return (1)
+    end
+
+    assert action_type = ACTION_CREATE_COMMENT
+    assert_nn(args_len - 2)
+    let comment_len = args[1]
+    assert_nn(comment_len)
+    assert_nn(args_len - 2 - comment_len)
+
+    let (creator_token_id_felt: felt) = get_comment_creator(caller)
+    let (comment_token_id: Uint256) = _Comment_createComment(caller, comment_len, args + 2, creator_token_id_felt, args[0])
+    Content_updateComments(token_id, comment_token_id)
+    return (2 + comment_len)
+end
@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import dataclasses
+import io
+import json
+import os
+import random
+import subprocess
+import tarfile
+import tempfile
+import time
+
+from starkware.crypto.signature.signature import private_to_stark_key
+from starkware.starknet.public.abi import get_storage_var_address
+from starkware.starknet.storage.starknet_storage import StorageLeaf
+from starkware.starknet.testing.starknet import Starknet
+
+from build_contracts import ROOT_DIR, CAIRO_PATH, compile_contract
+from deployment import deploy, snapshot
+from read_client import DecentralMediaReader, decode_result
+from resources import ResourceRecorder
+from signing import sign_stark_inputs
+from utils import *
+
+ADMIN_PRIVATE_KEY = 1234567
+USER_PRIVATE_KEY_BASE = 1000000
+CONTENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst. Etiam eget odio nisi. Donec in porttitor lacus.'
+COMMENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.'
+
+
+class BenchmarkUser:
+    def __init__(self, index):
+        self.index = index
+        self.private_key = USER_PRIVATE_KEY_BASE + index
+        self.address = private_to_stark_key(self.private_key)
+        self.token_id = index + 1
+
+    def sign(self, *inputs):
+        nonce = generate_nonce()
+        return nonce, sign_stark_inputs(self.private_key, [str(x) for x in inputs] + [str(nonce)])
+
+
+async def create_user(recorder, decentral_media, user):
+    fields = str_to_felt_arrays(['user%d' % user.index,
+                                 'https://picsum.photos/200',
+                                 'https://picsum.photos/seed/picsum/200/300',
+                                 'Benchmark user number %d.' % user.index,
+                                 'https://twitter.com/user%d' % user.index])
+    nonce, signature = user.sign(*[len(field) for field in fields])
+    await recorder.measure(decentral_media.create_user(*fields, nonce=nonce), size=user.index,
+                           caller_address=user.address, signature=signature)
+
+async def create_content(recorder, decentral_media, user, size):
+    content, authors = str_to_felt_arrays([CONTENT, 'user%d' % user.index])
+    tags = encode_tags('lorem,ipsum')
+    nonce, signature = user.sign(len(content), len(tags), len(authors), 1)
+    await recorder.measure(decentral_media.create_content(content, tags, authors, public=1, nonce=nonce), size=size,
+                           caller_address=user.address, signature=signature)
+
+async def create_comment(recorder, decentral_media, user, content_token_id, size):
+    comment = str_to_felt_array(COMMENT)
+    nonce, signature = user.sign(len(comment))
+    await recorder.measure(decentral_media.create_comment(comment, uint256(content_token_id), nonce=nonce), size=size,
+                           caller_address=user.address, signature=signature)
+
+async def act(recorder, function, user, size, *inputs, **kwargs):
+    nonce, signature = user.sign(*inputs)
+    await recorder.measure(function(nonce=nonce, **kwargs), size=size,
+                           caller_address=user.address, signature=signature)
+
+async def load(args):
+    start = time.perf_counter()
+    system = snapshot(await deploy(await Starknet.empty(), ADMIN_PRIVATE_KEY))
+    print('deployed in %.1f s' % (time.perf_counter() - start))
+
+    decentral_media = system.decentral_media
+    recorder = ResourceRecorder()
+    users = [BenchmarkUser(i) for i in range(args.users)]
+    popular = users[0]
+    others = users[1:]
+
+    for user in users:
+        await create_user(recorder, decentral_media, user)
+
+    contents = []
+    for i in range(args.contents):
+        await create_content(recorder, decentral_media, users[i % len(users)], size=i // len(users))
+        contents.append(i + 1)
+
+    comments = []
+    for content_token_id in contents:
+        for i in range(args.comments):
+            await create_comment(recorder, decentral_media, users[i % len(users)], content_token_id, size=i)
+            comments.append(len(comments) + 1)
+
+    # Storms all target the first user, content and comment so that the lists
+    # they touch grow by one entry per call.
+    for i, user in enumerate(others):
+        await act(recorder, decentral_media.follow, user, i, creator_token_id=uint256(popular.token_id))
+    for i, user in enumerate(others[::2]):
+        await act(recorder, decentral_media.unfollow, user, len(others) - i, creator_token_id=uint256(popular.token_id))
+
+    for i, user in enumerate(others):
+        await act(recorder, decentral_media.rate, user, i, i % 5 + 1, creator_token_id=uint256(popular.token_id), rating=i % 5 + 1)
+
+    if contents:
+        for i, user in enumerate(users):
+            await act(recorder, decentral_media.like_content, user, i, token_id=uint256(contents[0]))
+        for i, user in enumerate(users[::2]):
+            await act(recorder, decentral_media.dislike_content, user, i, token_id=uint256(contents[0]))
+
+    if comments:
+        for i, user in enumerate(users):
+            await act(recorder, decentral_media.like_comment, user, i, token_id=uint256(comments[0]))
+        for i, user in enumerate(users[::2]):
+            await act(recorder, decentral_media.dislike_comment, user, i, token_id=uint256(comments[0]))
+
+    for user in users:
+        await recorder.measure(decentral_media.get_user(address=user.address), view=True,
+                               size=len(others) if user is popular else 0)
+    for content_token_id in contents:
+        await recorder.measure(decentral_media.get_content(token_id=uint256(content_token_id)), view=True,
+                               size=args.comments)
+    for comment_token_id in comments:
+        await recorder.measure(decentral_media.get_comment(token_id=uint256(comment_token_id)), view=True)
+
+    return recorder
+
+def compile_baseline(ref):
+    # Modules that are not part of the archive (submodules) resolve from the
+    # working tree.
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT_DIR, check=True, stdout=subprocess.PIPE).stdout
+    with tempfile.TemporaryDirectory() as tree:
+        tarfile.open(fileobj=io.BytesIO(archive)).extractall(tree)
+        return compile_contract(os.path.join(tree, 'DecentralMedia.cairo'), [tree] + CAIRO_PATH)
+
+def write_storage(starknet_state, contract_address, values):
+    contract_state = starknet_state.state.contract_states[contract_address]
+    storage_updates = dict(contract_state.storage_updates)
+    storage_updates.update((key, StorageLeaf(value)) for key, value in values.items())
+    starknet_state.state.contract_states[contract_address] = dataclasses.replace(contract_state, storage_updates=storage_updates)
+
+async def seed_likers(system, content_token_id, likers):
+    # Cairo short strings hold up to 31 characters, more than str_to_felt allows.
+    set_name = int.from_bytes(b'content_liked_by', 'big')
+    values = {get_storage_var_address('indexed_set_len', set_name, content_token_id): len(likers)}
+    for index, liker in enumerate(likers):
+        values[get_storage_var_address('indexed_set_item', set_name, content_token_id, index)] = liker
+        values[get_storage_var_address('indexed_set_index', set_name, content_token_id, liker)] = index + 1
+    values[get_storage_var_address('content_stats', content_token_id)] = pack_lanes(pack_likes(len(likers)), 0, 1)
+    write_storage(system.starknet.state, system.decentral_media.contract_address, values)
+
+async def seed_legacy_likers(system, content_token_id, likers):
+    await system.content.setPropertyArray(str_to_felt('liked_by'), uint256(content_token_id), likers).invoke(
+        caller_address=system.decentral_media.contract_address)
+    await system.content.setPropertyFelt(str_to_felt('likes'), uint256(content_token_id), len(likers)).invoke(
+        caller_address=system.decentral_media.contract_address)
+
+async def likers(args):
+    contracts = [('current', None, seed_likers)]
+    if args.baseline:
+        # The baseline is expected to keep likers in the liked_by array of the
+        # content token, as the contract did before the indexed sets.
+        contracts.append((args.baseline, compile_baseline(args.baseline), seed_legacy_likers))
+
+    results = {}
+    for name, decentral_media_def, seed in contracts:
+        start = time.perf_counter()
+        system = await deploy(await Starknet.empty(), ADMIN_PRIVATE_KEY, decentral_media_def)
+        print('%s: deployed in %.1f s' % (name, time.perf_counter() - start))
+
+        recorder = ResourceRecorder()
+        user = BenchmarkUser(0)
+        await create_user(recorder, system.decentral_media, user)
+        await create_content(recorder, system.decentral_media, user, size=0)
+        content_token_id = 1
+
+        for size in args.sizes:
+            sized = snapshot(system)
+            start = time.perf_counter()
+            await seed(sized, content_token_id, list(range(2, size + 2)))
+            print('%s: seeded %d likers in %.1f s' % (name, size, time.perf_counter() - start))
+
+            await act(recorder, sized.decentral_media.like_content, user, size, token_id=uint256(content_token_id))
+            await act(recorder, sized.decentral_media.dislike_content, user, size, token_id=uint256(content_token_id))
+
+        results[name] = recorder
+    return results
+
+class DirectReader:
+    # The reads of DecentralMediaReader, without the cache.
+    def __init__(self, decentral_media):
+        self.decentral_media = decentral_media
+
+    async def get_content(self, token_id):
+        exec_info = await self.decentral_media.get_content(token_id=uint256(token_id)).call()
+        return decode_result('content', exec_info.result)
+
+    async def get_user(self, address):
+        exec_info = await self.decentral_media.get_user(address=address).call()
+        return decode_result('user', exec_info.result)
+
+    def apply_events(self, events):
+        pass
+
+async def feed(args):
+    start = time.perf_counter()
+    system = snapshot(await deploy(await Starknet.empty(), ADMIN_PRIVATE_KEY))
+    print('deployed in %.1f s' % (time.perf_counter() - start))
+
+    recorder = ResourceRecorder()
+    users = [BenchmarkUser(i) for i in range(args.users)]
+    for user in users:
+        await create_user(recorder, system.decentral_media, user)
+    for i in range(args.contents):
+        await create_content(recorder, system.decentral_media, users[i % len(users)], size=i)
+
+    # Content k + 1 is read with probability proportional to 1 / (k + 1)^s.
+    rnd = random.Random(args.seed)
+    weights = [1 / (k + 1) ** args.zipf for k in range(args.contents)]
+    reads = rnd.choices(range(1, args.contents + 1), weights=weights, k=args.reads)
+    writes = set(range(args.write_every - 1, args.reads, args.write_every)) if args.write_every else set()
+
+    results = {}
+    readers = [('direct', DirectReader),
+               ('cached', lambda decentral_media: DecentralMediaReader(decentral_media, max_entries=args.cache_size))]
+    for name, create_reader in readers:
+        # Both runs start from the same state, so they see the same likes.
+        run = snapshot(system)
+        reader = create_reader(run.decentral_media)
+        reader.apply_events(run.starknet.state.events)
+        start = time.perf_counter()
+        for i, content_token_id in enumerate(reads):
+            await reader.get_content(content_token_id)
+            await reader.get_user(users[(content_token_id - 1) % len(users)].address)
+            if i in writes:
+                await act(recorder, run.decentral_media.like_content, users[i % len(users)], i, token_id=uint256(content_token_id))
+                reader.apply_events(run.starknet.state.events)
+        wall_time = time.perf_counter() - start
+        results[name] = {'wall_time': wall_time, 'reads_per_second': 2 * len(reads) / wall_time}
+        if name == 'cached':
+            results[name]['cache'] = reader.summary()
+        print('%-8s %8.2f s %10.1f reads/s' % (name, wall_time, results[name]['reads_per_second']))
+    print('hit rate %.1f%%, %d invalidations' % (results['cached']['cache']['hit_rate'] * 100,
+                                                 results['cached']['cache']['invalidations']))
+    return results
+
+def print_summary(summary):
+    print('%-18s %6s %6s %10s %10s %10s %8s' % ('external', 'calls', 'errors', 'wall ms', 'steps', 'max steps', 'writes'))
+    for external, stats in summary.items():
+        if not stats['calls']:
+            print('%-18s %6d %6d' % (external, stats['calls'], stats['errors']))
+            continue
+        print('%-18s %6d %6d %10.1f %10.0f %10d %8.1f' % (
+            external, stats['calls'], stats['errors'], stats['wall_time']['mean'] * 1000,
+            stats['n_steps']['mean'], stats['n_steps']['max'], stats['storage_writes']['mean']))
+
+def print_samples(samples):
+    print('%-18s %8s %10s %10s %8s' % ('external', 'size', 'wall ms', 'steps', 'writes'))
+    for sample in samples:
+        print('%-18s %8d %10.1f %10d %8d' % (
+            sample.external, sample.size, sample.wall_time * 1000, sample.n_steps, sample.storage_writes))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DecentralMedia externals on a local StarkNet state.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='script users, contents, comments and follow/like/rate storms')
+    load_parser.add_argument('--users', type=int, default=10)
+    load_parser.add_argument('--contents', type=int, default=3)
+    load_parser.add_argument('--comments', type=int, default=2, help='comments per content')
+    load_parser.add_argument('--output', default='benchmark.json')
+
+    likers_parser = subparsers.add_parser('likers', help='like and dislike a content that already has many likers')
+    likers_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    likers_parser.add_argument('--baseline', help='git ref of a DecentralMedia.cairo to compare against')
+    likers_parser.add_argument('--output', default='benchmark.json')
+
+    feed_parser = subparsers.add_parser('feed', help='read contents and their creators with and without the read cache')
+    feed_parser.add_argument('--users', type=int, default=10)
+    feed_parser.add_argument('--contents', type=int, default=50)
+    feed_parser.add_argument('--reads', type=int, default=2000)
+    feed_parser.add_argument('--zipf', type=float, default=1.1, help='exponent of the Zipf distribution of reads')
+    feed_parser.add_argument('--write-every', type=int, default=50, help='like a content after every N reads, 0 for none')
+    feed_parser.add_argument('--cache-size', type=int, default=10000)
+    feed_parser.add_argument('--seed', type=int, default=0)
+    feed_parser.add_argument('--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        recorder = asyncio.get_event_loop().run_until_complete(load(args))
+        result = recorder.to_json()
+        result['config'] = {'users': args.users, 'contents': args.contents, 'comments': args.comments}
+        print_summary(result['summary'])
+    elif args.command == 'feed':
+        result = asyncio.get_event_loop().run_until_complete(feed(args))
+        result['config'] = {'users': args.users, 'contents': args.contents, 'reads': args.reads, 'zipf': args.zipf,
+                            'write_every': args.write_every, 'cache_size': args.cache_size}
+    else:
+        recorders = asyncio.get_event_loop().run_until_complete(likers(args))
+        result = {name: recorder.to_json() for name, recorder in recorders.items()}
+        result['config'] = {'sizes': args.sizes, 'baseline': args.baseline}
+        for name, recorder in recorders.items():
+            print(name)
+            print_samples([sample for sample in recorder.samples if sample.size is not None])
+            if recorder.errors:
+                print('errors: %s' % dict(recorder.errors))
+
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print('results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,37 @@
-import os
+import asyncio
+import io
+import json
+from types import SimpleNamespace
 from utils import *
 import pytest
-import functools
-from starkware.crypto.signature.signature import private_to_stark_key, sign
-from starkware.starknet.testing.contract import StarknetContract
-from starkware.starknet.testing.starknet import Starknet
+from starkware.crypto.signature.signature import private_to_stark_key
 from starkware.starkware_utils.error_handling import StarkException
-from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
 from starkware.starknet.business_logic.state import BlockInfo
+from starkware.starknet.public.abi import get_selector_from_name, get_storage_var_address
+
+from signing import sign_stark_inputs, sign_batch_actions
+from indexer import Indexer
+from client import DecentralMediaClient, signed_inputs
+from resources_plugin import ResourceProfile
+from read_client import DecentralMediaReader
 
 ADMIN = private_to_stark_key(1234567)
 USER1 = private_to_stark_key(7654321)
 USER2 = private_to_stark_key(123)
-ER721_CONTRACT_FILE = os.path.join(os.path.dirname(__file__), 'ERC721.cairo')
-DECMEDIA_CONTRACT_FILE = os.path.join(os.path.dirname(__file__), 'DecentralMedia.cairo')
-starknet = None
-decentral_media = None
+LOREM_CONTENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst. Etiam eget odio nisi. Donec in porttitor lacus. Etiam blandit, lectus ut pharetra feugiat, lacus dui maximus metus, vitae scelerisque turpis massa vel enim. Nunc vestibulum leo purus, eget iaculis sapien accumsan in. Vivamus maximus tellus at risus consequat, in ullamcorper ligula facilisis. Phasellus in lacus quam. Maecenas fringilla, mi sit amet condimentum pretium, arcu leo porttitor enim, a gravida erat ante vel neque. Curabitur cursus felis sed placerat feugiat. Sed eget mollis libero, ac lacinia ante. Fusce sit amet orci elementum, tristique turpis sed, condimentum quam. Ut elementum et lacus vehicula sollicitudin. Praesent tincidunt tellus vitae aliquam interdum.'
+LOREM_COMMENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst.'
 
 def set_block_timestamp(starknet_state, timestamp):
     starknet_state.state.block_info = BlockInfo(
         starknet_state.state.block_info.block_number, timestamp
     )
 
-def sign_stark_inputs(private_key, inputs):
-    message_hash = functools.reduce(
-        lambda x, y: pedersen_hash(y, x),
-        reversed([int(x, 16) if x.startswith('0x') else int(x) for x in inputs]), 0)
-    return sign(msg_hash=message_hash, priv_key=private_key)
-    
-async def deploy() -> (StarknetContract):
-    global starknet
-    global decentral_media
-    if starknet != None and decentral_media != None:
-        return
-
-    starknet = await Starknet.empty()
-    user = await starknet.deploy(
-        source=ER721_CONTRACT_FILE,
-        constructor_calldata=[str_to_felt("User Token"), str_to_felt("UT"), ADMIN],
-        cairo_path=['cairo-contracts'])
-    content = await starknet.deploy(
-        source=ER721_CONTRACT_FILE,
-        constructor_calldata=[str_to_felt("Content Token"), str_to_felt("CT"), ADMIN],
-        cairo_path=['cairo-contracts'])
-    comment = await starknet.deploy(
-        source=ER721_CONTRACT_FILE,
-        constructor_calldata=[str_to_felt("Comment Token"), str_to_felt("CMT"), ADMIN],
-        cairo_path=['cairo-contracts'])
-    decentral_media = await starknet.deploy(
-            source=DECMEDIA_CONTRACT_FILE,
-            constructor_calldata=[ADMIN],
-            cairo_path=['cairo-contracts'])
-
-    await user.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=ADMIN)
-    await content.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=ADMIN)
-    await comment.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=ADMIN)
-    
-    nonce = generate_nonce()
-    await decentral_media.set_user_erc721_contract(contract=user.contract_address, nonce=nonce).invoke(caller_address=ADMIN,
-        signature=sign_stark_inputs(1234567, [str(user.contract_address), str(nonce)]))
-
-    nonce = generate_nonce()
-    await decentral_media.set_content_erc721_contract(contract=content.contract_address, nonce=nonce).invoke(caller_address=ADMIN,
-        signature=sign_stark_inputs(1234567, [str(content.contract_address), str(nonce)]))
-
-    nonce = generate_nonce()
-    await decentral_media.set_comment_erc721_contract(contract=comment.contract_address, nonce=nonce).invoke(caller_address=ADMIN,
-        signature=sign_stark_inputs(1234567, [str(comment.contract_address), str(nonce)]))
-
-    return starknet, decentral_media
-
+def set_block_number(starknet_state, block_number):
+    starknet_state.state.block_info = BlockInfo(
+        block_number, starknet_state.state.block_info.block_timestamp
+    )
 
-@pytest.mark.asyncio
-async def test_create_user():
-    await deploy()
-    set_block_timestamp(starknet.state, 1)
+async def create_janez(decentral_media):
     nonce = generate_nonce()
     await decentral_media.create_user(username=str_to_felt_array('janez'),
                                  image=str_to_felt_array('https://picsum.photos/200'),
@@ -85,6 +42,48 @@ async def test_create_user():
                                     caller_address=USER1,
                                     signature=sign_stark_inputs(7654321, [str(1), str(2), str(3), str(3), str(2), str(nonce)]))
 
+async def create_marija(decentral_media):
+    nonce = generate_nonce()
+    await decentral_media.create_user(username=str_to_felt_array('Marija'),
+                                 image=str_to_felt_array('https://picsum.photos/200'),
+                                 background_image=str_to_felt_array('https://picsum.photos/seed/picsum/200/300'),
+                                 description=str_to_felt_array("I write articles!"),
+                                 social_link=str_to_felt_array('https://twitter.com/marija'),
+                                 nonce=nonce).invoke(
+                                    caller_address=USER2,
+                                    signature=sign_stark_inputs(123, [str(1), str(2), str(3), str(2), str(2), str(nonce)]))
+
+async def create_lorem_content(decentral_media):
+    nonce = generate_nonce()
+    await decentral_media.create_content(content=str_to_felt_array(LOREM_CONTENT),
+                                        tags=encode_tags('lorem,ipsum'),
+                                        authors=str_to_felt_array('janez novak'),
+                                        public=1,
+                                        nonce=nonce).invoke(
+                                            caller_address=USER1,
+                                            signature=sign_stark_inputs(7654321, [str(60), str(2), str(1), str(1), str(nonce)]))
+
+    user = await decentral_media.get_user(address=USER1).call()
+    return user.result.contents[-1]
+
+async def create_lorem_comment(decentral_media, content_token_id):
+    nonce = generate_nonce()
+    await decentral_media.create_comment(comment=str_to_felt_array(LOREM_COMMENT),
+                                        content_token_id=uint256(content_token_id),
+                                        nonce=nonce).invoke(
+                                            caller_address=USER2,
+                                            signature=sign_stark_inputs(123, [str(15), str(nonce)]))
+
+    content = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    return content.result.comments[-1]
+
+
+@pytest.mark.asyncio
+async def test_create_user(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 1)
+    await create_janez(decentral_media)
+
     exec_info = await decentral_media.get_user(address=USER1).call()
 
     assert felt_array_to_string(exec_info.result.username) == 'janez'
@@ -102,9 +101,11 @@ async def test_create_user():
 
 
 @pytest.mark.asyncio
-async def test_update_user():
-    await deploy()
-    set_block_timestamp(starknet.state, 2)
+async def test_update_user(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 1)
+    await create_janez(decentral_media)
+    set_block_timestamp(system.starknet.state, 2)
 
     nonce = generate_nonce()
     token_id = await decentral_media.get_user_token_id(USER1).call()
@@ -135,19 +136,11 @@ async def test_update_user():
 
 
 @pytest.mark.asyncio
-async def test_follow_user():
-    await deploy()
-    set_block_timestamp(starknet.state, 3)
-
-    nonce = generate_nonce()
-    await decentral_media.create_user(username=str_to_felt_array('Marija'),
-                                 image=str_to_felt_array('https://picsum.photos/200'),
-                                 background_image=str_to_felt_array('https://picsum.photos/seed/picsum/200/300'),
-                                 description=str_to_felt_array("I write articles!"),
-                                 social_link=str_to_felt_array('https://twitter.com/marija'),
-                                 nonce=nonce).invoke(
-                                    caller_address=USER2,
-                                    signature=sign_stark_inputs(123, [str(1), str(2), str(3), str(2), str(2), str(nonce)]))
+async def test_follow_user(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 3)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
 
     nonce = generate_nonce()
     token_id = await decentral_media.get_user_token_id(USER1).call()
@@ -181,9 +174,11 @@ async def test_follow_user():
 
 
 @pytest.mark.asyncio
-async def test_rate_user():
-    await deploy()
-    set_block_timestamp(starknet.state, 4)
+async def test_rate_user(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 4)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
 
     nonce = generate_nonce()
     token_id_creator = await decentral_media.get_user_token_id(USER2).call()
@@ -205,66 +200,130 @@ async def test_rate_user():
 
 
 @pytest.mark.asyncio
-async def test_create_content():
-    await deploy()
-    set_block_timestamp(starknet.state, 5)
+async def test_create_content(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 5)
+    await create_janez(decentral_media)
 
     nonce = generate_nonce()
-    await decentral_media.create_content(content=str_to_felt_array('Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst. Etiam eget odio nisi. Donec in porttitor lacus. Etiam blandit, lectus ut pharetra feugiat, lacus dui maximus metus, vitae scelerisque turpis massa vel enim. Nunc vestibulum leo purus, eget iaculis sapien accumsan in. Vivamus maximus tellus at risus consequat, in ullamcorper ligula facilisis. Phasellus in lacus quam. Maecenas fringilla, mi sit amet condimentum pretium, arcu leo porttitor enim, a gravida erat ante vel neque. Curabitur cursus felis sed placerat feugiat. Sed eget mollis libero, ac lacinia ante. Fusce sit amet orci elementum, tristique turpis sed, condimentum quam. Ut elementum et lacus vehicula sollicitudin. Praesent tincidunt tellus vitae aliquam interdum.'),
-                                        tags=str_to_felt_array('lorem,ipsum'),
+    await decentral_media.create_content(content=str_to_felt_array(LOREM_CONTENT),
+                                        tags=[str_to_felt('Lorem'), str_to_felt('ipsum'), str_to_felt('LOREM')],
                                         authors=str_to_felt_array('janez novak'),
                                         public=1,
                                         nonce=nonce).invoke(
                                             caller_address=USER1,
-                                            signature=sign_stark_inputs(7654321, [str(60), str(1), str(1), str(1), str(nonce)]))
+                                            signature=sign_stark_inputs(7654321, [str(60), str(3), str(1), str(1), str(nonce)]))
 
     token_id = await decentral_media.get_user_token_id(USER1).call()
     exec_info = await decentral_media.get_user(address=USER1).call()
     assert len(exec_info.result.contents) == 1
 
     exec_info = await decentral_media.get_content(token_id=uint256(exec_info.result.contents[0])).call()
-    assert felt_array_to_string(exec_info.result.content) == 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst. Etiam eget odio nisi. Donec in porttitor lacus. Etiam blandit, lectus ut pharetra feugiat, lacus dui maximus metus, vitae scelerisque turpis massa vel enim. Nunc vestibulum leo purus, eget iaculis sapien accumsan in. Vivamus maximus tellus at risus consequat, in ullamcorper ligula facilisis. Phasellus in lacus quam. Maecenas fringilla, mi sit amet condimentum pretium, arcu leo porttitor enim, a gravida erat ante vel neque. Curabitur cursus felis sed placerat feugiat. Sed eget mollis libero, ac lacinia ante. Fusce sit amet orci elementum, tristique turpis sed, condimentum quam. Ut elementum et lacus vehicula sollicitudin. Praesent tincidunt tellus vitae aliquam interdum.'
-    assert felt_array_to_string(exec_info.result.tags) == 'lorem,ipsum'
+    assert felt_array_to_string(exec_info.result.content) == LOREM_CONTENT
+    assert decode_tags(exec_info.result.tags) == ['lorem', 'ipsum']
     assert felt_array_to_string(exec_info.result.authors) == 'janez novak'
     assert exec_info.result.comments == []
     assert exec_info.result.liked_by == []
     assert exec_info.result.disliked_by == []
     assert exec_info.result.likes == 0
-    assert exec_info.result.views == 1
+    assert exec_info.result.views == 0
     assert exec_info.result.public == 1
     assert exec_info.result.created_at == 5
     assert exec_info.result.creator == uint256_to_felt(token_id.result[0])
 
 @pytest.mark.asyncio
-async def test_update_content():
-    await deploy()
-    set_block_timestamp(starknet.state, 6)
+async def test_update_content(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 6)
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
 
-    exec_info = await decentral_media.get_user(address=USER1).call()
     nonce = generate_nonce()
-    await decentral_media.update_content(token_id=uint256(exec_info.result.contents[0]),
+    await decentral_media.update_content(token_id=uint256(content_token_id),
                                         public=0,
+                                        tags=encode_tags(['Ipsum', 'dolor']),
                                         nonce=nonce).invoke(
                                             caller_address=USER1,
-                                            signature=sign_stark_inputs(7654321, [str(0), str(nonce)]))
+                                            signature=sign_stark_inputs(7654321, [str(0), str(2), str(nonce)]))
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
 
-    exec_info = await decentral_media.get_content(token_id=uint256(exec_info.result.contents[0])).call()
-    
     assert exec_info.result.public == 0
+    assert decode_tags(exec_info.result.tags) == ['ipsum', 'dolor']
 
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('lorem'), offset=0, limit=10).call()
+    assert exec_info.result.token_ids == []
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('dolor'), offset=0, limit=10).call()
+    assert exec_info.result.token_ids == [content_token_id]
 
 @pytest.mark.asyncio
-async def test_like_content():
-    await deploy()
-    set_block_timestamp(starknet.state, 7)
+async def test_update_content_of_other_user(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    for token_id in [content_token_id, content_token_id + 1]:
+        nonce = generate_nonce()
+        with pytest.raises(StarkException):
+            await decentral_media.update_content(token_id=uint256(token_id),
+                                                public=0,
+                                                tags=encode_tags(['spam']),
+                                                nonce=nonce).invoke(
+                                                    caller_address=USER2,
+                                                    signature=sign_stark_inputs(123, [str(0), str(1), str(nonce)]))
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.public == 1
+    assert decode_tags(exec_info.result.tags) == ['lorem', 'ipsum']
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('spam'), offset=0, limit=10).call()
+    assert exec_info.result.token_ids == []
+
+
+@pytest.mark.asyncio
+async def test_record_views(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 6)
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    await decentral_media.get_content(token_id=uint256(content_token_id)).invoke()
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.views == 0
 
-    user = await decentral_media.get_user(address=USER1).call()
     nonce = generate_nonce()
-    await decentral_media.like_content(token_id=uint256(user.result.contents[0]),
+    inputs = [content_token_id, content_token_id, 3, 4, nonce]
+    await decentral_media.record_views(token_ids=[content_token_id, content_token_id],
+                                       counts=[3, 4],
+                                       nonce=nonce).invoke(
+                                            caller_address=ADMIN,
+                                            signature=sign_stark_inputs(1234567, [str(x) for x in inputs]))
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.views == 7
+
+    nonce = generate_nonce()
+    with pytest.raises(StarkException):
+        await decentral_media.record_views(token_ids=[content_token_id],
+                                           counts=[100],
+                                           nonce=nonce).invoke(
+                                                caller_address=USER1,
+                                                signature=sign_stark_inputs(7654321, [str(content_token_id), str(100), str(nonce)]))
+
+
+@pytest.mark.asyncio
+async def test_like_content(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 7)
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    nonce = generate_nonce()
+    await decentral_media.like_content(token_id=uint256(content_token_id),
                                 nonce=nonce).invoke(caller_address=USER1,
                                             signature=sign_stark_inputs(7654321, [str(nonce)]))
 
-    exec_info = await decentral_media.get_content(token_id=uint256(user.result.contents[0])).call()
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
     token_id = await decentral_media.get_user_token_id(USER1).call()
 
     assert exec_info.result.likes == 1
@@ -272,20 +331,21 @@ async def test_like_content():
     assert exec_info.result.disliked_by == []
 
     nonce = generate_nonce()
-    await decentral_media.dislike_content(token_id=uint256(user.result.contents[0]),
+    await decentral_media.dislike_content(token_id=uint256(content_token_id),
                                 nonce=nonce).invoke(caller_address=USER1,
                                             signature=sign_stark_inputs(7654321, [str(nonce)]))
 
-    exec_info = await decentral_media.get_content(token_id=uint256(user.result.contents[0])).call()    
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
     assert exec_info.result.likes == int_to_negative_felt(-1)
     assert exec_info.result.liked_by == []
     assert exec_info.result.disliked_by[0] == uint256_to_felt(token_id.result[0])
 
 
 @pytest.mark.asyncio
-async def test_flag_user():
-    await deploy()
-    set_block_timestamp(starknet.state, 8)
+async def test_flag_user(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 8)
+    await create_marija(decentral_media)
 
     token_id = await decentral_media.get_user_token_id(USER2).call()
     nonce = generate_nonce()
@@ -295,13 +355,13 @@ async def test_flag_user():
                                             signature=sign_stark_inputs(1234567, [str(1), str(nonce)]))
     nonce = generate_nonce()
     with pytest.raises(StarkException):
-        await decentral_media.create_content(content=str_to_felt_array('Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst. Etiam eget odio nisi. Donec in porttitor lacus. Etiam blandit, lectus ut pharetra feugiat, lacus dui maximus metus, vitae scelerisque turpis massa vel enim. Nunc vestibulum leo purus, eget iaculis sapien accumsan in. Vivamus maximus tellus at risus consequat, in ullamcorper ligula facilisis. Phasellus in lacus quam. Maecenas fringilla, mi sit amet condimentum pretium, arcu leo porttitor enim, a gravida erat ante vel neque. Curabitur cursus felis sed placerat feugiat. Sed eget mollis libero, ac lacinia ante. Fusce sit amet orci elementum, tristique turpis sed, condimentum quam. Ut elementum et lacus vehicula sollicitudin. Praesent tincidunt tellus vitae aliquam interdum.'),
-                                        tags=str_to_felt_array('lorem,ipsum'),
+        await decentral_media.create_content(content=str_to_felt_array(LOREM_CONTENT),
+                                        tags=encode_tags('lorem,ipsum'),
                                         authors=str_to_felt_array('janez novak'),
                                         public=1,
                                         nonce=nonce).invoke(
                                             caller_address=USER2,
-                                            signature=sign_stark_inputs(123, [str(60), str(1), str(1), str(1), str(nonce)]))
+                                            signature=sign_stark_inputs(123, [str(60), str(2), str(1), str(1), str(nonce)]))
 
     nonce = generate_nonce()
     await decentral_media.flag_user(token_id=token_id.result[0],
@@ -311,45 +371,49 @@ async def test_flag_user():
 
 
 @pytest.mark.asyncio
-async def test_create_comment():
-    await deploy()
-    set_block_timestamp(starknet.state, 9)
+async def test_create_comment(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 9)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
 
-    user = await decentral_media.get_user(address=USER1).call()
     token_id_user_2 = await decentral_media.get_user_token_id(USER2).call()
 
     nonce = generate_nonce()
-    await decentral_media.create_comment(comment=str_to_felt_array('Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst.'),
-                                        content_token_id=uint256(user.result.contents[0]),
+    await decentral_media.create_comment(comment=str_to_felt_array(LOREM_COMMENT),
+                                        content_token_id=uint256(content_token_id),
                                         nonce=nonce).invoke(
                                             caller_address=USER2,
                                             signature=sign_stark_inputs(123, [str(15), str(nonce)]))
 
-    exec_info = await decentral_media.get_content(token_id=uint256(user.result.contents[0])).call()
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
     assert len(exec_info.result.comments) == 1
 
     exec_info = await decentral_media.get_comment(token_id=uint256(exec_info.result.comments[0])).call()
-    assert felt_array_to_string(exec_info.result.comment) == 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Fusce quam metus, euismod a tellus ac, efficitur aliquam ex. Nulla varius velit quam, vitae fringilla enim condimentum a. In hac habitasse platea dictumst.'
+    assert felt_array_to_string(exec_info.result.comment) == LOREM_COMMENT
     assert exec_info.result.liked_by == []
     assert exec_info.result.disliked_by == []
     assert exec_info.result.likes == 0
     assert exec_info.result.created_at == 9
     assert exec_info.result.creator == uint256_to_felt(token_id_user_2.result[0])
-    assert exec_info.result.content == user.result.contents[0]
+    assert exec_info.result.content == content_token_id
 
 @pytest.mark.asyncio
-async def test_like_comment():
-    await deploy()
-    set_block_timestamp(starknet.state, 10)
+async def test_like_comment(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 10)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    comment_token_id = await create_lorem_comment(decentral_media, content_token_id)
 
-    user = await decentral_media.get_user(address=USER1).call()
-    content = await decentral_media.get_content(token_id=uint256(user.result.contents[0])).call()
     nonce = generate_nonce()
-    await decentral_media.like_comment(token_id=uint256(content.result.comments[0]),
+    await decentral_media.like_comment(token_id=uint256(comment_token_id),
                                 nonce=nonce).invoke(caller_address=USER1,
                                             signature=sign_stark_inputs(7654321, [str(nonce)]))
 
-    exec_info = await decentral_media.get_comment(token_id=uint256(content.result.comments[0])).call()
+    exec_info = await decentral_media.get_comment(token_id=uint256(comment_token_id)).call()
     token_id = await decentral_media.get_user_token_id(USER1).call()
 
     assert exec_info.result.likes == 1
@@ -357,11 +421,619 @@ async def test_like_comment():
     assert exec_info.result.disliked_by == []
 
     nonce = generate_nonce()
-    await decentral_media.dislike_comment(token_id=uint256(user.result.contents[0]),
+    await decentral_media.dislike_comment(token_id=uint256(comment_token_id),
                                 nonce=nonce).invoke(caller_address=USER1,
                                             signature=sign_stark_inputs(7654321, [str(nonce)]))
 
-    exec_info = await decentral_media.get_comment(token_id=uint256(content.result.comments[0])).call()    
+    exec_info = await decentral_media.get_comment(token_id=uint256(comment_token_id)).call()
     assert exec_info.result.likes == int_to_negative_felt(-1)
     assert exec_info.result.liked_by == []
     assert exec_info.result.disliked_by[0] == uint256_to_felt(token_id.result[0])
+
+@pytest.mark.asyncio
+async def test_reactions_and_follows_by_many_users(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 11)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    token_id_1 = await decentral_media.get_user_token_id(USER1).call()
+    token_id_2 = await decentral_media.get_user_token_id(USER2).call()
+    user_1 = uint256_to_felt(token_id_1.result[0])
+    user_2 = uint256_to_felt(token_id_2.result[0])
+
+    for address, private_key in [(USER1, 7654321), (USER2, 123)]:
+        nonce = generate_nonce()
+        await decentral_media.like_content(token_id=uint256(content_token_id),
+                                    nonce=nonce).invoke(caller_address=address,
+                                                signature=sign_stark_inputs(private_key, [str(nonce)]))
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.likes == 2
+    assert exec_info.result.liked_by == [user_1, user_2]
+
+    nonce = generate_nonce()
+    with pytest.raises(StarkException):
+        await decentral_media.like_content(token_id=uint256(content_token_id),
+                                    nonce=nonce).invoke(caller_address=USER1,
+                                                signature=sign_stark_inputs(7654321, [str(nonce)]))
+
+    nonce = generate_nonce()
+    await decentral_media.dislike_content(token_id=uint256(content_token_id),
+                                nonce=nonce).invoke(caller_address=USER1,
+                                            signature=sign_stark_inputs(7654321, [str(nonce)]))
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.likes == 0
+    assert exec_info.result.liked_by == [user_2]
+    assert exec_info.result.disliked_by == [user_1]
+
+    nonce = generate_nonce()
+    await decentral_media.follow(creator_token_id=token_id_1.result[0],
+                                 nonce=nonce).invoke(
+                                    caller_address=USER2,
+                                    signature=sign_stark_inputs(123, [str(nonce)]))
+    nonce = generate_nonce()
+    await decentral_media.follow(creator_token_id=token_id_2.result[0],
+                                 nonce=nonce).invoke(
+                                    caller_address=USER2,
+                                    signature=sign_stark_inputs(123, [str(nonce)]))
+
+    exec_info = await decentral_media.get_user(address=USER2).call()
+    assert exec_info.result.following == [user_1, user_2]
+
+    nonce = generate_nonce()
+    await decentral_media.unfollow(creator_token_id=token_id_1.result[0],
+                                    nonce=nonce).invoke(
+                                    caller_address=USER2,
+                                    signature=sign_stark_inputs(123, [str(nonce)]))
+
+    exec_info = await decentral_media.get_user(address=USER2).call()
+    assert exec_info.result.following == [user_2]
+    assert exec_info.result.followers == [user_2]
+
+    exec_info = await decentral_media.get_user(address=USER1).call()
+    assert exec_info.result.followers == []
+
+@pytest.mark.asyncio
+async def test_paginated_views(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 12)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    comments = [await create_lorem_comment(decentral_media, content_token_id) for _ in range(3)]
+
+    token_id_1 = await decentral_media.get_user_token_id(USER1).call()
+    token_id_2 = await decentral_media.get_user_token_id(USER2).call()
+    nonce = generate_nonce()
+    await decentral_media.follow(creator_token_id=token_id_1.result[0],
+                                 nonce=nonce).invoke(
+                                    caller_address=USER2,
+                                    signature=sign_stark_inputs(123, [str(nonce)]))
+    nonce = generate_nonce()
+    await decentral_media.like_content(token_id=uint256(content_token_id),
+                                nonce=nonce).invoke(caller_address=USER2,
+                                            signature=sign_stark_inputs(123, [str(nonce)]))
+
+    exec_info = await decentral_media.get_content_comments(token_id=uint256(content_token_id), offset=0, limit=2).call()
+    assert exec_info.result.comments == comments[:2]
+    exec_info = await decentral_media.get_content_comments(token_id=uint256(content_token_id), offset=2, limit=2).call()
+    assert exec_info.result.comments == comments[2:]
+    exec_info = await decentral_media.get_content_comments(token_id=uint256(content_token_id), offset=4, limit=2).call()
+    assert exec_info.result.comments == []
+    for offset, limit in [(0, int_to_negative_felt(-1)), (int_to_negative_felt(-1), 2)]:
+        with pytest.raises(StarkException):
+            await decentral_media.get_content_comments(token_id=uint256(content_token_id), offset=offset, limit=limit).call()
+
+    exec_info = await decentral_media.get_content_liked_by(token_id=uint256(content_token_id), offset=0, limit=10).call()
+    assert exec_info.result.liked_by == [uint256_to_felt(token_id_2.result[0])]
+    exec_info = await decentral_media.get_content_disliked_by(token_id=uint256(content_token_id), offset=0, limit=10).call()
+    assert exec_info.result.disliked_by == []
+
+    exec_info = await decentral_media.get_content_header(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.comments_count == 3
+    assert exec_info.result.liked_by_count == 1
+    assert exec_info.result.disliked_by_count == 0
+    assert exec_info.result.likes == 1
+    assert exec_info.result.public == 1
+    assert exec_info.result.created_at == 12
+    assert exec_info.result.creator == uint256_to_felt(token_id_1.result[0])
+
+    exec_info = await decentral_media.get_user_followers(address=USER1, offset=0, limit=10).call()
+    assert exec_info.result.followers == [uint256_to_felt(token_id_2.result[0])]
+    exec_info = await decentral_media.get_user_following(address=USER2, offset=0, limit=10).call()
+    assert exec_info.result.following == [uint256_to_felt(token_id_1.result[0])]
+    exec_info = await decentral_media.get_user_contents(address=USER1, offset=0, limit=10).call()
+    assert exec_info.result.contents == [content_token_id]
+
+    exec_info = await decentral_media.get_comment_liked_by(token_id=uint256(comments[0]), offset=0, limit=10).call()
+    assert exec_info.result.liked_by == []
+
+@pytest.mark.asyncio
+async def test_batched_views(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 13)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    comment_token_id = await create_lorem_comment(decentral_media, content_token_id)
+
+    token_id_1 = uint256_to_felt((await decentral_media.get_user_token_id(USER1).call()).result[0])
+    token_id_2 = uint256_to_felt((await decentral_media.get_user_token_id(USER2).call()).result[0])
+
+    exec_info = await decentral_media.get_users(token_ids=[token_id_2, token_id_1]).call()
+    users = decode_users(exec_info.result.offsets, exec_info.result.values)
+    assert [user['username'] for user in users] == ['Marija', 'janez']
+    assert users[0]['description'] == 'I write articles!'
+    assert users[1]['rating'] == [0, 0]
+    assert users[1]['created_at'] == 13
+    assert users[1]['contents_count'] == 1
+    assert users[1]['followers_count'] == 0
+
+    # A token id without a user does not fail the batch.
+    exec_info = await decentral_media.get_users(token_ids=[token_id_1, 99]).call()
+    users = decode_users(exec_info.result.offsets, exec_info.result.values)
+    assert users[0]['username'] == 'janez'
+    assert users[1]['username'] == ''
+    assert users[1]['rating'] == [0, 0]
+    assert users[1]['created_at'] == 0
+
+    exec_info = await decentral_media.get_contents(token_ids=[content_token_id]).call()
+    [content] = decode_contents(exec_info.result.offsets, exec_info.result.values)
+    assert content['content'] == LOREM_CONTENT
+    assert content['tags'] == ['lorem', 'ipsum']
+    assert content['authors'] == 'janez novak'
+    assert content['views'] == 0
+    assert content['public'] == 1
+    assert content['creator'] == token_id_1
+    assert content['comments_count'] == 1
+    assert content['liked_by_count'] == 0
+
+    exec_info = await decentral_media.get_comments(token_ids=[comment_token_id]).call()
+    [comment] = decode_comments(exec_info.result.offsets, exec_info.result.values)
+    assert comment['comment'] == LOREM_COMMENT
+    assert comment['creator'] == token_id_2
+    assert comment['content'] == content_token_id
+
+    exec_info = await decentral_media.get_contents(token_ids=[]).call()
+    assert decode_contents(exec_info.result.offsets, exec_info.result.values) == []
+
+@pytest.mark.asyncio
+async def test_batch_actions(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 14)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    comment_token_id = await create_lorem_comment(decentral_media, content_token_id)
+
+    token_id_1 = uint256_to_felt((await decentral_media.get_user_token_id(USER1).call()).result[0])
+    token_id_2 = uint256_to_felt((await decentral_media.get_user_token_id(USER2).call()).result[0])
+
+    nonce = generate_nonce()
+    action_types, args, signature = sign_batch_actions(123, [
+        (ACTION_FOLLOW, token_id_1),
+        (ACTION_RATE, token_id_1, 4),
+        (ACTION_LIKE_CONTENT, content_token_id),
+        (ACTION_DISLIKE_COMMENT, comment_token_id),
+        (ACTION_CREATE_COMMENT, content_token_id, 'Thanks!'),
+        (ACTION_LIKE_COMMENT, comment_token_id),
+    ], nonce)
+
+    # The signature covers the whole batch.
+    with pytest.raises(StarkException):
+        await decentral_media.batch_actions(action_types=action_types, args=args[:-1] + [comment_token_id + 1],
+                                            nonce=nonce).invoke(caller_address=USER2, signature=signature)
+
+    await decentral_media.batch_actions(action_types=action_types, args=args, nonce=nonce).invoke(
+        caller_address=USER2, signature=signature)
+
+    exec_info = await decentral_media.get_user(address=USER1).call()
+    assert exec_info.result.followers == [token_id_2]
+    assert exec_info.result.rating == [1, 4]
+
+    exec_info = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.likes == 1
+    assert exec_info.result.liked_by == [token_id_2]
+    assert len(exec_info.result.comments) == 2
+
+    exec_info = await decentral_media.get_comment(token_id=uint256(exec_info.result.comments[1])).call()
+    assert felt_array_to_string(exec_info.result.comment) == 'Thanks!'
+    assert exec_info.result.creator == token_id_2
+
+    exec_info = await decentral_media.get_comment(token_id=uint256(comment_token_id)).call()
+    assert exec_info.result.likes == 1
+    assert exec_info.result.liked_by == [token_id_2]
+    assert exec_info.result.disliked_by == []
+
+@pytest.mark.asyncio
+async def test_indexer(system, tmp_path):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 15)
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    comment_token_id = await create_lorem_comment(decentral_media, content_token_id)
+
+    token_id_1 = uint256_to_felt((await decentral_media.get_user_token_id(USER1).call()).result[0])
+    token_id_2 = uint256_to_felt((await decentral_media.get_user_token_id(USER2).call()).result[0])
+
+    nonce = generate_nonce()
+    action_types, args, signature = sign_batch_actions(123, [
+        (ACTION_FOLLOW, token_id_1),
+        (ACTION_RATE, token_id_1, 5),
+        (ACTION_DISLIKE_CONTENT, content_token_id),
+    ], nonce)
+    await decentral_media.batch_actions(action_types=action_types, args=args, nonce=nonce).invoke(
+        caller_address=USER2, signature=signature)
+
+    path = str(tmp_path / 'index.sqlite')
+    indexer = Indexer(path, decentral_media.contract_address, batch_size=2)
+    assert indexer.index(system.starknet.state.events) == 7
+    assert indexer.checkpoint == len(system.starknet.state.events)
+    db = indexer.connection
+    assert db.execute('SELECT token_id, address, created_at FROM users ORDER BY token_id').fetchall() == [
+        (token_id_1, hex(USER1), 15), (token_id_2, hex(USER2), 15)]
+    assert db.execute('SELECT follower, creator FROM follows').fetchall() == [(token_id_2, token_id_1)]
+    assert db.execute('SELECT user, creator, rating FROM ratings').fetchall() == [(token_id_2, token_id_1, 5)]
+    assert db.execute('SELECT token_id, creator, public FROM contents').fetchall() == [(content_token_id, token_id_1, 1)]
+    assert db.execute('SELECT content, creator FROM comments').fetchall() == [(content_token_id, token_id_2)]
+    assert db.execute('SELECT SUM(reaction) FROM content_reactions WHERE content = ?', (content_token_id,)).fetchone() == (-1,)
+    indexer.close()
+
+    nonce = generate_nonce()
+    await decentral_media.like_content(token_id=uint256(content_token_id), nonce=nonce).invoke(
+        caller_address=USER2, signature=sign_stark_inputs(123, [str(nonce)]))
+    nonce = generate_nonce()
+    await decentral_media.like_comment(token_id=uint256(comment_token_id), nonce=nonce).invoke(
+        caller_address=USER1, signature=sign_stark_inputs(7654321, [str(nonce)]))
+    nonce = generate_nonce()
+    inputs = [content_token_id, 3, nonce]
+    await decentral_media.record_views(token_ids=[content_token_id], counts=[3], nonce=nonce).invoke(
+        caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(x) for x in inputs]))
+    nonce = generate_nonce()
+    await decentral_media.unfollow(creator_token_id=uint256(token_id_1), nonce=nonce).invoke(
+        caller_address=USER2, signature=sign_stark_inputs(123, [str(nonce)]))
+    nonce = generate_nonce()
+    await decentral_media.flag_user(token_id=uint256(token_id_2), flag=1, nonce=nonce).invoke(
+        caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(1), str(nonce)]))
+
+    # A new indexer on the same database resumes from the checkpoint.
+    indexer = Indexer(path, decentral_media.contract_address)
+    assert indexer.index(system.starknet.state.events) == 5
+    assert indexer.index(system.starknet.state.events) == 0
+    db = indexer.connection
+    assert db.execute('SELECT reaction FROM content_reactions').fetchall() == [(1,)]
+    assert db.execute('SELECT comment, user, reaction FROM comment_reactions').fetchall() == [(comment_token_id, token_id_1, 1)]
+    assert db.execute('SELECT views FROM contents').fetchall() == [(3,)]
+    assert db.execute('SELECT COUNT(*) FROM follows').fetchone() == (0,)
+    assert db.execute('SELECT flagged FROM users WHERE token_id = ?', (token_id_2,)).fetchone() == (1,)
+    indexer.close()
+
+@pytest.mark.asyncio
+async def test_indexer_large_views(system, tmp_path):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    # Views stay below 2^63, so the indexer can store them as SQLite integers.
+    for count, fails in [(2**63 - 4, False), (4, True), (3, False)]:
+        nonce = generate_nonce()
+        inputs = [content_token_id, count, nonce]
+        invocation = decentral_media.record_views(token_ids=[content_token_id], counts=[count], nonce=nonce)
+        signature = sign_stark_inputs(1234567, [str(x) for x in inputs])
+        if fails:
+            with pytest.raises(StarkException):
+                await invocation.invoke(caller_address=ADMIN, signature=signature)
+        else:
+            await invocation.invoke(caller_address=ADMIN, signature=signature)
+
+    nonce = generate_nonce()
+    with pytest.raises(StarkException):
+        await decentral_media.update_content(token_id=uint256(content_token_id), public=2**63, tags=[], nonce=nonce).invoke(
+            caller_address=USER1, signature=sign_stark_inputs(7654321, [str(2**63), str(0), str(nonce)]))
+
+    indexer = Indexer(str(tmp_path / 'index.sqlite'), decentral_media.contract_address)
+    indexer.index(system.starknet.state.events)
+    assert indexer.connection.execute('SELECT views FROM contents').fetchall() == [(2**63 - 1,)]
+    indexer.close()
+
+def test_indexer_quarantine(tmp_path):
+    contract_address = 0x1234
+    events = [
+        SimpleNamespace(from_address=contract_address, keys=[get_selector_from_name('ContentLiked')], data=[2**200, 1]),
+        SimpleNamespace(from_address=contract_address, keys=[get_selector_from_name('ContentLiked')], data=[2, 1]),
+    ]
+
+    indexer = Indexer(str(tmp_path / 'index.sqlite'), contract_address)
+    assert indexer.index(events) == 2
+    assert indexer.checkpoint == 2
+    db = indexer.connection
+    assert db.execute('SELECT content, user FROM content_reactions').fetchall() == [(2, 1)]
+    assert db.execute('SELECT position, event, data FROM quarantine').fetchall() == [
+        (0, 'ContentLiked', json.dumps({'token_id': hex(2**200), 'user_token_id': hex(1)}))]
+    indexer.close()
+
+@pytest.mark.asyncio
+async def test_contents_by_tag(system):
+    decentral_media = system.decentral_media
+    set_block_timestamp(system.starknet.state, 16)
+    await create_janez(decentral_media)
+    content_token_ids = [await create_lorem_content(decentral_media) for _ in range(3)]
+
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('Lorem'), offset=0, limit=10).call()
+    assert sorted(exec_info.result.token_ids) == content_token_ids
+
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('ipsum'), offset=1, limit=1).call()
+    assert len(exec_info.result.token_ids) == 1
+
+    exec_info = await decentral_media.get_contents_by_tag(tag=str_to_felt('dolor'), offset=0, limit=10).call()
+    assert exec_info.result.token_ids == []
+
+    exec_info = await decentral_media.get_contents(token_ids=exec_info.result.token_ids).call()
+    assert decode_contents(exec_info.result.offsets, exec_info.result.values) == []
+
+@pytest.mark.asyncio
+async def test_token_id_encoding(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    # The first content is stored in the ERC721 storage contract under Uint256(1, 0).
+    assert content_token_id == 1
+    exec_info = await system.content.getPropertyArray(str_to_felt('authors'), (1, 0)).call()
+    assert felt_array_to_string(exec_info.result.property) == 'janez novak'
+    exec_info = await system.content.getPropertyArray(str_to_felt('authors'), (0, 1)).call()
+    assert exec_info.result.property == []
+
+    # Tokens minted with the old encoding stay readable through their felt id.
+    legacy_token_id = 3 * 2**128
+    assert uint256(legacy_token_id) == (0, 3)
+    await system.content.setPropertyFelt(str_to_felt('creator'), uint256(legacy_token_id), 1).invoke(
+        caller_address=decentral_media.contract_address)
+    exec_info = await decentral_media.get_content_header(token_id=uint256(legacy_token_id)).call()
+    assert exec_info.result.creator == 1
+
+    # record_views takes the felt ids of the list views, so it covers both encodings.
+    nonce = generate_nonce()
+    inputs = [content_token_id, legacy_token_id, 2, 5, nonce]
+    await decentral_media.record_views(token_ids=[content_token_id, legacy_token_id], counts=[2, 5], nonce=nonce).invoke(
+        caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(x) for x in inputs]))
+    exec_info = await decentral_media.get_content_header(token_id=uint256(content_token_id)).call()
+    assert exec_info.result.views == 2
+    exec_info = await decentral_media.get_content_header(token_id=uint256(legacy_token_id)).call()
+    assert exec_info.result.views == 5
+
+@pytest.mark.asyncio
+async def test_migrate_counters(system):
+    decentral_media = system.decentral_media
+    legacy_token_id = 100
+
+    # A content written by the contract before the packed records.
+    for name, value in [('likes', int_to_negative_felt(-2)), ('views', 7), ('public', 1), ('created_at', 3), ('creator', 1)]:
+        await system.content.setPropertyFelt(str_to_felt(name), uint256(legacy_token_id), value).invoke(
+            caller_address=decentral_media.contract_address)
+
+    exec_info = await decentral_media.get_content_header(token_id=uint256(legacy_token_id)).call()
+    assert exec_info.result.likes == int_to_negative_felt(-2)
+    assert exec_info.result.views == 7
+
+    nonce = generate_nonce()
+    with pytest.raises(StarkException):
+        await decentral_media.migrate_counters(kind=str_to_felt('content'), token_ids=[legacy_token_id], nonce=nonce).invoke(
+            caller_address=USER1, signature=sign_stark_inputs(7654321, [str(str_to_felt('content')), str(legacy_token_id), str(nonce)]))
+
+    await decentral_media.migrate_counters(kind=str_to_felt('content'), token_ids=[legacy_token_id], nonce=nonce).invoke(
+        caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(str_to_felt('content')), str(legacy_token_id), str(nonce)]))
+
+    contract_state = system.starknet.state.state.contract_states[decentral_media.contract_address]
+    packed = contract_state.storage_updates[get_storage_var_address('content_stats', legacy_token_id)].value
+    assert packed == pack_lanes(pack_likes(-2), 7, 1)
+
+    # The legacy properties are not read anymore.
+    await system.content.setPropertyFelt(str_to_felt('views'), uint256(legacy_token_id), 0).invoke(
+        caller_address=decentral_media.contract_address)
+    exec_info = await decentral_media.get_content_header(token_id=uint256(legacy_token_id)).call()
+    assert exec_info.result.likes == int_to_negative_felt(-2)
+    assert exec_info.result.views == 7
+    assert exec_info.result.public == 1
+    assert exec_info.result.created_at == 3
+    assert exec_info.result.creator == 1
+
+@pytest.mark.asyncio
+async def test_migrate_counters_legacy_ids(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+
+    # Tokens minted before the token id fix have ids n * 2**128, which do not
+    # fit a 64 bit lane.
+    legacy_creator = 5 * 2**128
+    legacy_content = 3 * 2**128
+    legacy_comment = 4 * 2**128
+    for name, value in [('created_at', 3), ('creator', legacy_creator), ('public', 1)]:
+        await system.content.setPropertyFelt(str_to_felt(name), uint256(legacy_content), value).invoke(
+            caller_address=decentral_media.contract_address)
+    for name, value in [('created_at', 4), ('creator', legacy_creator), ('content', legacy_content)]:
+        await system.comment.setPropertyFelt(str_to_felt(name), uint256(legacy_comment), value).invoke(
+            caller_address=decentral_media.contract_address)
+
+    for kind, token_id in [('content', legacy_content), ('comment', legacy_comment)]:
+        nonce = generate_nonce()
+        inputs = [str_to_felt(kind), token_id, nonce]
+        await decentral_media.migrate_counters(kind=str_to_felt(kind), token_ids=[token_id], nonce=nonce).invoke(
+            caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(x) for x in inputs]))
+
+    exec_info = await decentral_media.get_content_header(token_id=uint256(legacy_content)).call()
+    assert (exec_info.result.created_at, exec_info.result.creator) == (3, legacy_creator)
+    exec_info = await decentral_media.get_comment(token_id=uint256(legacy_comment)).call()
+    assert (exec_info.result.created_at, exec_info.result.creator, exec_info.result.content) == (4, legacy_creator, legacy_content)
+
+    # Legacy contents can be commented on.
+    nonce = generate_nonce()
+    await decentral_media.create_comment(comment=str_to_felt_array(LOREM_COMMENT),
+                                         content_token_id=uint256(legacy_content),
+                                         nonce=nonce).invoke(
+                                            caller_address=USER2,
+                                            signature=sign_stark_inputs(123, [str(15), str(nonce)]))
+    exec_info = await decentral_media.get_content_comments(token_id=uint256(legacy_content), offset=0, limit=10).call()
+    exec_info = await decentral_media.get_comment(token_id=uint256(exec_info.result.comments[0])).call()
+    assert exec_info.result.content == legacy_content
+
+@pytest.mark.asyncio
+async def test_migrate_sets(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+    token_id_1 = uint256_to_felt((await decentral_media.get_user_token_id(USER1).call()).result[0])
+    token_id_2 = uint256_to_felt((await decentral_media.get_user_token_id(USER2).call()).result[0])
+
+    # Lists written by the contract before the indexed sets.
+    await system.content.setPropertyArray(str_to_felt('liked_by'), uint256(content_token_id), [token_id_2]).invoke(
+        caller_address=decentral_media.contract_address)
+    await system.user.setPropertyArray(str_to_felt('followers'), uint256(token_id_1), [token_id_2]).invoke(
+        caller_address=decentral_media.contract_address)
+    await system.user.setPropertyArray(str_to_felt('following'), uint256(token_id_2), [token_id_1]).invoke(
+        caller_address=decentral_media.contract_address)
+
+    for kind, token_ids in [('content', [content_token_id]), ('user', [token_id_1, token_id_2]), ('user', [token_id_1])]:
+        nonce = generate_nonce()
+        inputs = [str_to_felt(kind)] + token_ids + [nonce]
+        await decentral_media.migrate_sets(kind=str_to_felt(kind), token_ids=token_ids, nonce=nonce).invoke(
+            caller_address=ADMIN, signature=sign_stark_inputs(1234567, [str(x) for x in inputs]))
+
+    exec_info = await decentral_media.get_content_liked_by(token_id=uint256(content_token_id), offset=0, limit=10).call()
+    assert exec_info.result.liked_by == [token_id_2]
+    exec_info = await decentral_media.get_user(address=USER1).call()
+    assert exec_info.result.followers == [token_id_2]
+    assert exec_info.result.contents == [content_token_id]
+    exec_info = await decentral_media.get_user(address=USER2).call()
+    assert exec_info.result.following == [token_id_1]
+    exec_info = await system.content.getPropertyArray(str_to_felt('liked_by'), uint256(content_token_id)).call()
+    assert exec_info.result.property == []
+
+    # The like from before the upgrade still counts.
+    nonce = generate_nonce()
+    with pytest.raises(StarkException):
+        await decentral_media.like_content(token_id=uint256(content_token_id), nonce=nonce).invoke(
+            caller_address=USER2, signature=sign_stark_inputs(123, [str(nonce)]))
+
+@pytest.mark.asyncio
+async def test_client(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    await create_marija(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    with DecentralMediaClient(decentral_media, max_concurrency=1) as client:
+        await client.invoke('create_content', 123, content=str_to_felt_array(LOREM_COMMENT),
+                            tags=encode_tags('lorem'), authors=str_to_felt_array('marija'), public=1)
+        results = await client.invoke_many([
+            ('like_content', 123, {'token_id': uint256(content_token_id)}),
+            ('create_comment', 123, {'comment': str_to_felt_array(LOREM_COMMENT), 'content_token_id': uint256(content_token_id)}),
+        ])
+
+    assert not any(isinstance(result, Exception) for result in results)
+
+    user = await decentral_media.get_user(address=USER2).call()
+    content = await decentral_media.get_content(token_id=uint256(content_token_id)).call()
+    assert len(user.result.contents) == 1
+    assert content.result.likes == 1
+    assert len(content.result.comments) == 1
+
+@pytest.mark.asyncio
+async def test_read_client(system):
+    decentral_media = system.decentral_media
+    await create_janez(decentral_media)
+    content_token_id = await create_lorem_content(decentral_media)
+
+    reader = DecentralMediaReader(decentral_media, max_entries=2)
+    reader.apply_events(system.starknet.state.events)
+    token_id = await reader.get_user_token_id(USER1)
+    contents = await asyncio.gather(*[reader.get_content(content_token_id) for _ in range(3)])
+    assert contents[0]['content'] == LOREM_CONTENT
+    assert contents[0]['tags'] == ['lorem', 'ipsum']
+    assert (reader.stats['misses'], reader.stats['coalesced']) == (2, 2)
+
+    user = await reader.get_user(USER1)
+    assert user['username'] == 'janez'
+    assert await reader.get_content(content_token_id) is contents[0]
+    assert reader.stats['evictions'] == 1
+
+    nonce = generate_nonce()
+    await decentral_media.like_content(token_id=uint256(content_token_id), nonce=nonce).invoke(
+        caller_address=USER1, signature=sign_stark_inputs(7654321, [str(nonce)]))
+    reader.apply_events(system.starknet.state.events)
+    assert (await reader.get_content(content_token_id))['likes'] == 1
+    assert ('user', USER1) in reader.entries
+
+    set_block_number(system.starknet.state, 5)
+    await reader.get_user(USER1)
+    assert reader.stats['misses'] == 5
+    assert token_id == uint256_to_felt((await decentral_media.get_user_token_id(USER1).call()).result[0])
+
+def test_felt_array_batch_codec():
+    texts = ['janez', '', 'https://picsum.photos/seed/picsum/200/300', 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.']
+    arrays = str_to_felt_arrays(texts)
+
+    assert arrays == [str_to_felt_array(text) for text in texts]
+    assert felt_arrays_to_strings(arrays) == texts
+    assert felt_arrays_to_strings(str_to_felt_arrays(['čokolada in žličnik'])) == ['čokolada in žličnik']
+
+def test_felt_stream_codec():
+    text = 'Članek o čebelah, ki nabirajo med na travniku. ' * 20
+    felts = list(stream_str_to_felts(io.StringIO(text), read_size=7))
+
+    assert felts == str_to_felt_array(text)
+    assert all(len(felt_to_str(felt).encode()) <= MAX_LEN_FELT for felt in felts)
+    assert list(stream_str_to_felts(io.BytesIO(text.encode()), read_size=7)) == felts
+
+    sink = io.StringIO()
+    stream_felts_to_str(iter(felts), sink)
+    assert sink.getvalue() == text
+
+    # 'č' is two bytes and would end at byte 16, so it starts the second felt.
+    expected = [int.from_bytes(b'a' * 14, 'big'), int.from_bytes('čb'.encode(), 'big')]
+    assert list(stream_str_to_felts(io.StringIO('a' * 14 + 'čb'), read_size=3)) == expected
+    with pytest.raises(UnicodeDecodeError):
+        list(stream_str_to_felts(io.BytesIO(b'\x80' * 20)))
+
+def test_tag_codec():
+    assert normalize_tags(' Lorem, ipsum,,LOREM ') == ['lorem', 'ipsum']
+    assert decode_tags(encode_tags(['Čebela', 'a' * 31])) == ['Čebela', 'a' * 31]
+    assert normalize_tags(['ČEBELA', 'Ärger']) == ['Čebela', 'Ärger']
+    with pytest.raises(Exception):
+        encode_tags(['a' * 32])
+
+def test_packed_lanes():
+    packed = pack_lanes(pack_likes(-3), 2**64 - 1, 1)
+    assert packed < FIELD_PRIME
+    a, b, c = unpack_lanes(packed)
+    assert (unpack_likes(a), b, c) == (-3, 2**64 - 1, 1)
+    with pytest.raises(Exception):
+        pack_lanes(2**64)
+
+def test_signed_inputs():
+    assert signed_inputs('create_content', 9, content=[1, 2, 3], tags=[4], authors=[5, 6], public=1) == [3, 1, 2, 1, 9]
+    assert signed_inputs('record_views', 9, token_ids=[1, 2], counts=[3, 4]) == [1, 2, 3, 4, 9]
+    assert signed_inputs('like_content', 9, token_id=uint256(1)) == [9]
+
+def test_nonce_source():
+    nonces = NonceSource()
+    values = [nonces.next() for _ in range(10000)]
+    assert len(set(values)) == len(values)
+    assert all(value < FIELD_PRIME for value in values)
+    assert generate_nonce() != generate_nonce()
+
+def test_resource_profile():
+    profile = ResourceProfile()
+    profile.merge({'like_content': {'3': {'n_steps': 100, 'builtins.pedersen': 4}}})
+    profile.merge({'like_content': {'3': {'n_steps': 90, 'builtins.pedersen': 5}, '5': {'n_steps': 500}}})
+
+    assert profile.to_json() == {'like_content': {'3': {'builtins.pedersen': 5, 'n_steps': 100}, '5': {'n_steps': 500}}}
+    baseline = {'like_content': {'3': {'n_steps': 96, 'builtins.pedersen': 4}}}
+    assert profile.regressions(baseline, 0.05) == [('like_content', '3', 'builtins.pedersen', 4, 5)]
+    assert profile.regressions(baseline, 0.25) == []
@@ -7,8 +7,9 @@ from starkware.cairo.common.uint256 import Uint256, uint256_eq
 from starkware.cairo.common.math import assert_nn
 
 
-from utils.Array import concat_arr, assert_array_not_includes, assert_array_includes, array_remove_element
-from utils.DecentralMediaHelper import deserialize, Array, Uint256_to_felt, felt_to_Uint256
+from utils.Array import concat_arr, assert_array_not_includes
+from utils.DecentralMediaHelper import deserialize, append_properties, append_array, append_felt, Array, Uint256_to_felt, felt_to_Uint256, pack_lanes, unpack_lanes, migrate_property_array
+from utils.IndexedSet import indexed_set_length, indexed_set_add, indexed_set_remove, indexed_set_read
 from utils.utils import verify_inputs_by_signature
 from starknet_erc721_storage.IStorage import IStorage
 from IERC721 import IERC721
@@ -30,6 +31,40 @@ end
 func user_counter() -> (token_id : felt):
 end
 
+# Packed num_ratings, sum_ratings and created_at.
+@storage_var
+func user_stats(token_id : felt) -> (packed : felt):
+end
+
+
+#
+# Events
+#
+
+@event
+func UserCreated(token_id : felt, address : felt, created_at : felt):
+end
+
+@event
+func UserUpdated(token_id : felt):
+end
+
+@event
+func UserFollowed(token_id : felt, creator_token_id : felt):
+end
+
+@event
+func UserUnfollowed(token_id : felt, creator_token_id : felt):
+end
+
+@event
+func UserRated(token_id : felt, creator_token_id : felt, rating : felt):
+end
+
+@event
+func UserFlagged(token_id : felt, flag : felt):
+end
+
 
 #
 # Getters
@@ -92,27 +127,180 @@ func User_getUser{
     assert [names + 2] = 'background_image'
     assert [names + 3] = 'description'
     assert [names + 4] = 'social_link'
-    assert [names + 5] = 'following'
-    assert [names + 6] = 'followers'
-    assert [names + 7] = 'contents'
-    assert [names + 8] = 'rated'
-    assert [names + 9] = 'rating'
-    assert [names + 10] = 'created_at'
-
-    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 11, names, token_id)
+    assert [names + 5] = 'rated'
+
+    let (offsets_len, offsets, properties_len, properties) = IStorage.getProperties(contract, 6, names, token_id)
     let (user_data_len: felt, user_data: Array*) = deserialize(offsets_len, offsets, properties_len, properties)
+    let (num_ratings: felt, sum_ratings: felt, created_at: felt) = User_readStats(contract, token_id)
+    let (local rating: felt*) = alloc()
+    assert rating[0] = num_ratings
+    assert rating[1] = sum_ratings
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (following_len: felt) = indexed_set_length('user_following', token_id_felt)
+    let (following_len: felt, following: felt*) = indexed_set_read('user_following', token_id_felt, 0, following_len)
+    let (followers_len: felt) = indexed_set_length('user_followers', token_id_felt)
+    let (followers_len: felt, followers: felt*) = indexed_set_read('user_followers', token_id_felt, 0, followers_len)
+    let (contents_len: felt) = indexed_set_length('user_contents', token_id_felt)
+    let (contents_len: felt, contents: felt*) = indexed_set_read('user_contents', token_id_felt, 0, contents_len)
 
     return (user_data[0].len, user_data[0].arr,
             user_data[1].len, user_data[1].arr,
             user_data[2].len, user_data[2].arr,
             user_data[3].len, user_data[3].arr,
             user_data[4].len, user_data[4].arr,
+            following_len, following,
+            followers_len, followers,
+            contents_len, contents,
             user_data[5].len, user_data[5].arr,
-            user_data[6].len, user_data[6].arr,
-            user_data[7].len, user_data[7].arr,
-            user_data[8].len, user_data[8].arr,
-            user_data[9].len, user_data[9].arr,
-            user_data[10].arr[0])
+            2, rating,
+            created_at)
+end
+
+func User_getFollowing{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    following_len: felt,
+    following: felt*):
+    let (token_id) = user_token_id.read(address=address)
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (following_len: felt, following: felt*) = indexed_set_read('user_following', token_id_felt, offset, limit)
+    return (following_len, following)
+end
+
+func User_getFollowers{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    followers_len: felt,
+    followers: felt*):
+    let (token_id) = user_token_id.read(address=address)
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (followers_len: felt, followers: felt*) = indexed_set_read('user_followers', token_id_felt, offset, limit)
+    return (followers_len, followers)
+end
+
+func User_getContents{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    address : felt,
+    offset : felt,
+    limit : felt) -> (
+    contents_len: felt,
+    contents: felt*):
+    let (token_id) = user_token_id.read(address=address)
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (contents_len: felt, contents: felt*) = indexed_set_read('user_contents', token_id_felt, offset, limit)
+    return (contents_len, contents)
+end
+
+func User_getUsers{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*) -> (
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*):
+    alloc_locals
+
+    let (contract) = user_contract.read()
+
+    let (local names : felt*) = alloc()
+    assert [names] = 'username'
+    assert [names + 1] = 'image'
+    assert [names + 2] = 'background_image'
+    assert [names + 3] = 'description'
+    assert [names + 4] = 'social_link'
+
+    let (local offsets : felt*) = alloc()
+    let (local values : felt*) = alloc()
+    let (offsets_len, values_len) = User_serializeUsers(contract, names, token_ids_len, token_ids, 0, offsets, 0, values)
+
+    return (offsets_len, offsets, values_len, values)
+end
+
+func User_serializeUsers{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    names : felt*,
+    token_ids_len : felt,
+    token_ids : felt*,
+    offsets_len : felt,
+    offsets : felt*,
+    values_len : felt,
+    values : felt*) -> (
+    offsets_len: felt,
+    values_len: felt):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return (offsets_len, values_len)
+    end
+
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (properties_offsets_len, properties_offsets, properties_len, properties) = IStorage.getProperties(contract, 5, names, token_id)
+    let (offsets_len, values_len) = append_properties(offsets_len, offsets, values_len, values, properties_offsets_len, properties_offsets, properties_len, properties)
+
+    let (num_ratings: felt, sum_ratings: felt, created_at: felt) = User_readStats(contract, token_id)
+    let (local rating: felt*) = alloc()
+    assert rating[0] = num_ratings
+    assert rating[1] = sum_ratings
+    let (offsets_len, values_len) = append_array(offsets_len, offsets, values_len, values, 2, rating)
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, created_at)
+
+    let (following_count: felt) = indexed_set_length('user_following', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, following_count)
+    let (followers_count: felt) = indexed_set_length('user_followers', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, followers_count)
+    let (contents_count: felt) = indexed_set_length('user_contents', token_ids[0])
+    let (offsets_len, values_len) = append_felt(offsets_len, offsets, values_len, values, contents_count)
+
+    let (offsets_len, values_len) = User_serializeUsers(contract, names, token_ids_len - 1, token_ids + 1, offsets_len, offsets, values_len, values)
+
+    return (offsets_len, values_len)
+end
+
+# Users created before the packed records keep rating and created_at as
+# IStorage properties, which are read until the user is rated or migrated.
+# Token ids without a user read as zero stats.
+func User_readStats{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    token_id : Uint256) -> (
+    num_ratings: felt,
+    sum_ratings: felt,
+    created_at: felt):
+    alloc_locals
+
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    let (packed: felt) = user_stats.read(token_id_felt)
+    if packed == 0:
+        let (rating_len: felt, rating: felt*) = IStorage.getPropertyArray(contract, 'rating', token_id)
+        let (created_at: felt) = IStorage.getPropertyFelt(contract, 'created_at', token_id)
+        # Unknown token ids have no rating array.
+        if rating_len == 0:
+            return (0, 0, created_at)
+        end
+        return (rating[0], rating[1], created_at)
+    end
+
+    let (num_ratings: felt, sum_ratings: felt, created_at: felt) = unpack_lanes(packed)
+    return (num_ratings, sum_ratings, created_at)
 end
 
 
@@ -163,8 +351,6 @@ func User_createUser{
     assert [names + 2] = 'background_image'
     assert [names + 3] = 'description'
     assert [names + 4] = 'social_link'
-    assert [names + 5] = 'created_at'
-    assert [names + 6] = 'rating'
 
     let (local offsets: felt*) = alloc()
     assert [offsets] = username_len
@@ -172,27 +358,19 @@ func User_createUser{
     assert [offsets + 2] = offsets[1] + background_image_len
     assert [offsets + 3] = offsets[2] + description_len
     assert [offsets + 4] = offsets[3] + social_link_len
-    assert [offsets + 5] = offsets[4] + 1
-    assert [offsets + 6] = offsets[5] + 2
-
-    let (local timestamp_arr: felt*) = alloc()
-    assert [timestamp_arr] = timestamp
-
-    let (local rating_arr: felt*) = alloc()
-    assert [rating_arr] = 0
-    assert [rating_arr + 1] = 0
 
     let (values_len, values) = concat_arr(username_len, username, image_len, image)
     let (values_len, values) = concat_arr(values_len, values, background_image_len, background_image)
     let (values_len, values) = concat_arr(values_len, values, description_len, description)
     let (values_len, values) = concat_arr(values_len, values, social_link_len, social_link)
-    let (values_len, values) = concat_arr(values_len, values, 1, timestamp_arr)
-    let (values_len, values) = concat_arr(values_len, values, 2, rating_arr)
 
-    IStorage.setProperties(contract, 7, names, token_id, 7, offsets, values_len, values)
+    IStorage.setProperties(contract, 5, names, token_id, 5, offsets, values_len, values)
+    let (stats: felt) = pack_lanes(0, 0, timestamp)
+    user_stats.write(counter + 1, stats)
 
     user_token_id.write(caller, token_id)
     user_counter.write(counter + 1)
+    UserCreated.emit(counter + 1, caller, timestamp)
     return ()
 end
 
@@ -250,6 +428,9 @@ func User_updateUser{
 
     IStorage.setProperties(contract, 5, names, token_id, 5, offsets, values_len, values)
 
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    UserUpdated.emit(token_id_felt)
+
     return ()
 end
 
@@ -261,12 +442,9 @@ func User_updateContents{
     content_token_id: Uint256):
     alloc_locals
 
-    let (contract) = user_contract.read()
-
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (content_token_id_felt: felt) = Uint256_to_felt(content_token_id)
-    let (user_contents_len: felt, user_contents: felt*) = IStorage.getPropertyArray(contract, 'contents', token_id)
-    assert user_contents[user_contents_len] = content_token_id_felt
-    IStorage.setPropertyArray(contract, 'contents', token_id, user_contents_len + 1, user_contents)
+    indexed_set_add('user_contents', token_id_felt, content_token_id_felt)
 
     return ()
 end
@@ -285,20 +463,27 @@ func User_follow{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
-    let (contract) = user_contract.read()
     let (token_id: Uint256) = user_token_id.read(caller)
+    _User_follow(token_id, creator_token_id)
+
+    return ()
+end
+
+func _User_follow{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    creator_token_id: Uint256):
+    alloc_locals
+
     let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (creator_token_id_felt: felt) = Uint256_to_felt(creator_token_id)
 
-    let (following_len: felt, following: felt*) = IStorage.getPropertyArray(contract, 'following', token_id)
-    assert_array_not_includes(following_len, following, creator_token_id_felt, 1)
-    assert following[following_len] = creator_token_id_felt
-
-    let (followers_len: felt, followers: felt*) = IStorage.getPropertyArray(contract, 'followers', creator_token_id)
-    assert followers[followers_len] = token_id_felt
+    indexed_set_add('user_following', token_id_felt, creator_token_id_felt)
+    indexed_set_add('user_followers', creator_token_id_felt, token_id_felt)
 
-    IStorage.setPropertyArray(contract, 'following', token_id, following_len + 1, following)
-    IStorage.setPropertyArray(contract, 'followers', creator_token_id, followers_len + 1, followers)
+    UserFollowed.emit(token_id_felt, creator_token_id_felt)
 
     return ()
 end
@@ -318,20 +503,27 @@ func User_unfollow{
     assert inputs[0] = nonce
     verify_inputs_by_signature(caller, 1, inputs)
 
-    let (contract) = user_contract.read()
     let (token_id: Uint256) = user_token_id.read(caller)
+    _User_unfollow(token_id, creator_token_id)
+
+    return ()
+end
+
+func _User_unfollow{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    creator_token_id: Uint256):
+    alloc_locals
+
     let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (creator_token_id_felt: felt) = Uint256_to_felt(creator_token_id)
 
-    let (following_len: felt, following: felt*) = IStorage.getPropertyArray(contract, 'following', token_id)
-    assert_array_includes(following_len, following, creator_token_id_felt, 1)
-    array_remove_element(following_len, following, creator_token_id_felt)
-
-    let (followers_len: felt, followers: felt*) = IStorage.getPropertyArray(contract, 'followers', creator_token_id)
-    array_remove_element(followers_len, followers, token_id_felt)
+    indexed_set_remove('user_following', token_id_felt, creator_token_id_felt)
+    indexed_set_remove('user_followers', creator_token_id_felt, token_id_felt)
 
-    IStorage.setPropertyArray(contract, 'following', token_id, following_len - 1, following)
-    IStorage.setPropertyArray(contract, 'followers', creator_token_id, followers_len - 1, followers)
+    UserUnfollowed.emit(token_id_felt, creator_token_id_felt)
 
     return ()
 end
@@ -346,17 +538,31 @@ func User_rate{
     nonce: felt):
     alloc_locals
 
-    assert_nn(5 - rating)
-    assert_nn(rating - 1)
-
     let (caller) = get_caller_address()
     let inputs : felt* = alloc()
     assert inputs[0] = rating
     assert inputs[1] = nonce
     verify_inputs_by_signature(caller, 2, inputs)
 
-    let (contract) = user_contract.read()
     let (token_id: Uint256) = user_token_id.read(caller)
+    _User_rate(token_id, creator_token_id, rating)
+
+    return ()
+end
+
+func _User_rate{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_id: Uint256,
+    creator_token_id: Uint256,
+    rating: felt):
+    alloc_locals
+
+    assert_nn(5 - rating)
+    assert_nn(rating - 1)
+
+    let (contract) = user_contract.read()
     let (token_id_felt: felt) = Uint256_to_felt(token_id)
     let (creator_token_id_felt: felt) = Uint256_to_felt(creator_token_id)
 
@@ -367,12 +573,60 @@ func User_rate{
 
     IStorage.setPropertyArray(contract, 'rated', token_id, rated_len + 2, rated)
 
-    let (ratings_len: felt, ratings: felt*) = IStorage.getPropertyArray(contract, 'rating', creator_token_id)
-    let (new_rating: felt*) = alloc()
-    assert new_rating[0] = ratings[0] + 1      # num_ratings
-    assert new_rating[1] = ratings[1] + rating # sum_ratings
+    let (num_ratings: felt, sum_ratings: felt, created_at: felt) = User_readStats(contract, creator_token_id)
+    let (stats: felt) = pack_lanes(num_ratings + 1, sum_ratings + rating, created_at)
+    user_stats.write(creator_token_id_felt, stats)
+
+    UserRated.emit(token_id_felt, creator_token_id_felt, rating)
+
+    return ()
+end
+
+# Copies the counters of users created before the packed records into them.
+func User_migrateCounters{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = user_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    let (num_ratings: felt, sum_ratings: felt, created_at: felt) = User_readStats(contract, token_id)
+    let (stats: felt) = pack_lanes(num_ratings, sum_ratings, created_at)
+    user_stats.write(token_ids[0], stats)
+
+    User_migrateCounters(token_ids_len - 1, token_ids + 1)
+
+    return ()
+end
+
+# Moves the following, followers and contents arrays of users created before
+# the indexed sets into them.
+func User_migrateSets{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    token_ids_len : felt,
+    token_ids : felt*):
+    alloc_locals
+
+    if token_ids_len == 0:
+        return ()
+    end
+
+    let (contract) = user_contract.read()
+    let (token_id: Uint256) = felt_to_Uint256(token_ids[0])
+    migrate_property_array(contract, 'following', token_id, 'user_following', token_ids[0])
+    migrate_property_array(contract, 'followers', token_id, 'user_followers', token_ids[0])
+    migrate_property_array(contract, 'contents', token_id, 'user_contents', token_ids[0])
 
-    IStorage.setPropertyArray(contract, 'rating', creator_token_id, 2, new_rating)
+    User_migrateSets(token_ids_len - 1, token_ids + 1)
 
     return ()
 end
@@ -415,5 +669,8 @@ func User_flag{
     let (contract) = user_contract.read()
     IStorage.setPropertyFelt(contract, 'flaged', token_id, flag)
 
+    let (token_id_felt: felt) = Uint256_to_felt(token_id)
+    UserFlagged.emit(token_id_felt, flag)
+
     return ()
 end
\ No newline at end of file
@@ -0,0 +1,93 @@
+import argparse
+import hashlib
+import os
+import re
+import time
+
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.services.api.contract_definition import ContractDefinition
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ERC721_CONTRACT_FILE = os.path.join(ROOT_DIR, 'ERC721.cairo')
+DECMEDIA_CONTRACT_FILE = os.path.join(ROOT_DIR, 'DecentralMedia.cairo')
+CONTRACT_FILES = [ERC721_CONTRACT_FILE, DECMEDIA_CONTRACT_FILE]
+CAIRO_PATH = [ROOT_DIR, os.path.join(ROOT_DIR, 'cairo-contracts')]
+CACHE_DIR = os.environ.get('DECMEDIA_CONTRACT_CACHE', os.path.join(ROOT_DIR, '.contract_cache'))
+
+IMPORT_RE = re.compile(r'^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))', re.MULTILINE)
+
+
+def find_module(module, cairo_path):
+    relative_path = os.path.join(*module.split('.')) + '.cairo'
+    # Fall back to the repository rather than the working directory, so the
+    # closure (and the cache key) does not depend on where this runs from.
+    for path in cairo_path + [ROOT_DIR]:
+        filename = os.path.join(path, relative_path)
+        if os.path.isfile(filename):
+            return os.path.abspath(filename)
+    # Modules shipped with cairo-lang (starkware.*) are covered by its version.
+    return None
+
+def import_closure(source, cairo_path=CAIRO_PATH):
+    files = {}
+    stack = [os.path.abspath(source)]
+    while stack:
+        filename = stack.pop()
+        if filename in files:
+            continue
+        with open(filename, 'rb') as f:
+            files[filename] = f.read()
+        for match in IMPORT_RE.finditer(files[filename].decode()):
+            dependency = find_module(match.group(1) or match.group(2), cairo_path)
+            if dependency is not None:
+                stack.append(dependency)
+    return files
+
+def contract_hash(source, cairo_path=CAIRO_PATH):
+    # Only the content of each file is hashed, not its location, so artifacts
+    # stay valid across checkouts in different directories.
+    key = hashlib.sha256(CAIRO_LANG_VERSION.encode())
+    for code in sorted(hashlib.sha256(code).hexdigest() for code in import_closure(source, cairo_path).values()):
+        key.update(code.encode())
+    return key.hexdigest()
+
+def artifact_path(source, cairo_path=CAIRO_PATH, cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir, '%s-%s.json' % (name, contract_hash(source, cairo_path)))
+
+def compile_contract(source, cairo_path=CAIRO_PATH, cache_dir=CACHE_DIR, force=False):
+    path = artifact_path(source, cairo_path, cache_dir)
+
+    if os.path.exists(path) and not force:
+        with open(path) as f:
+            return ContractDefinition.loads(f.read())
+
+    contract_def = compile_starknet_files(files=[source], debug_info=True, cairo_path=cairo_path)
+
+    # Write to a temporary file first so that parallel workers never read a
+    # partially written artifact.
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(contract_def.dumps())
+    os.replace(tmp_path, path)
+
+    return contract_def
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile contracts into the artifact cache.')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help='recompile even if an artifact exists')
+    args = parser.parse_args()
+
+    for source in CONTRACT_FILES:
+        path = artifact_path(source, cache_dir=args.cache_dir)
+        status = 'miss' if args.force or not os.path.exists(path) else 'hit'
+        start = time.perf_counter()
+        compile_contract(source, cache_dir=args.cache_dir, force=args.force)
+        print('%-22s %-4s %8.2f s  %s' % (os.path.basename(source), status, time.perf_counter() - start, os.path.relpath(path)))
+
+
+if __name__ == '__main__':
+    main()
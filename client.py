@@ -0,0 +1,90 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from starkware.crypto.signature.signature import private_to_stark_key
+
+from signing import sign_stark_inputs
+from utils import NonceSource
+
+# Signed inputs of every external, in order; the nonce always comes last.
+# 'name_len' is the length of the array argument name and '*name' all its items.
+SIGNED_INPUTS = {
+    'create_user': ['username_len', 'image_len', 'background_image_len', 'description_len', 'social_link_len'],
+    'update_user': ['username_len', 'image_len', 'background_image_len', 'description_len', 'social_link_len'],
+    'follow': [],
+    'unfollow': [],
+    'rate': ['rating'],
+    'flag_user': ['flag'],
+    'set_user_erc721_contract': ['contract'],
+    'create_content': ['content_len', 'tags_len', 'authors_len', 'public'],
+    'update_content': ['public', 'tags_len'],
+    'like_content': [],
+    'dislike_content': [],
+    'record_views': ['*token_ids', '*counts'],
+    'migrate_counters': ['kind', '*token_ids'],
+    'migrate_sets': ['kind', '*token_ids'],
+    'set_content_erc721_contract': ['contract'],
+    'create_comment': ['comment_len'],
+    'like_comment': [],
+    'dislike_comment': [],
+    'set_comment_erc721_contract': ['contract'],
+    'batch_actions': ['action_types_len', '*action_types', '*args'],
+}
+
+
+def signed_inputs(external, nonce, **kwargs):
+    inputs = []
+    for name in SIGNED_INPUTS[external]:
+        if name.startswith('*'):
+            inputs += kwargs[name[1:]]
+        elif name.endswith('_len') and name not in kwargs:
+            inputs.append(len(kwargs[name[:-len('_len')]]))
+        else:
+            inputs.append(kwargs[name])
+    return inputs + [nonce]
+
+@functools.lru_cache(maxsize=None)
+def public_key(private_key):
+    return private_to_stark_key(private_key)
+
+
+class DecentralMediaClient:
+    # Signs in a process pool, since hashing and signing are pure Python, and
+    # keeps at most max_concurrency invocations in flight. A local StarknetState
+    # executes every invoke on its own copy of the state and may drop the writes
+    # of overlapping ones, so use max_concurrency=1 against it; signing still
+    # runs in parallel.
+    def __init__(self, decentral_media, max_concurrency=16, executor=None, nonces=None):
+        self.decentral_media = decentral_media
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.owns_executor = executor is None
+        self.executor = ProcessPoolExecutor() if executor is None else executor
+        self.nonces = NonceSource() if nonces is None else nonces
+
+    async def sign(self, private_key, inputs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, sign_stark_inputs, private_key, [str(x) for x in inputs])
+
+    async def invoke(self, external, private_key, **kwargs):
+        nonce = self.nonces.next()
+        signature = await self.sign(private_key, signed_inputs(external, nonce, **kwargs))
+        invocation = getattr(self.decentral_media, external)(nonce=nonce, **kwargs)
+        async with self.semaphore:
+            return await invocation.invoke(caller_address=public_key(private_key), signature=signature)
+
+    async def invoke_many(self, calls):
+        # calls is a list of (external, private_key, kwargs) tuples. Results
+        # come back in the same order; failed calls return their exception.
+        return await asyncio.gather(*[self.invoke(external, private_key, **kwargs) for external, private_key, kwargs in calls],
+                                    return_exceptions=True)
+
+    def close(self):
+        if self.owns_executor:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
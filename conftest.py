@@ -0,0 +1,26 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from starkware.starknet.testing.starknet import Starknet
+
+from deployment import deploy, snapshot
+
+pytest_plugins = ['resources_plugin']
+
+ADMIN_PRIVATE_KEY = 1234567
+
+
+@pytest.fixture(scope='session')
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest_asyncio.fixture(scope='session')
+async def deployed_system():
+    starknet = await Starknet.empty()
+    return await deploy(starknet, ADMIN_PRIVATE_KEY)
+
+@pytest.fixture
+def system(deployed_system):
+    return snapshot(deployed_system)
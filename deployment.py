@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+from starkware.crypto.signature.signature import private_to_stark_key
+from starkware.starknet.testing.contract import StarknetContract
+from starkware.starknet.testing.starknet import Starknet
+from starkware.starknet.testing.state import StarknetState
+
+from build_contracts import ERC721_CONTRACT_FILE, DECMEDIA_CONTRACT_FILE, compile_contract
+from signing import sign_stark_inputs
+from utils import *
+
+DecentralMediaSystem = namedtuple('DecentralMediaSystem', ['starknet', 'decentral_media', 'user', 'content', 'comment'])
+
+
+async def deploy(starknet, admin_private_key, decentral_media_def=None):
+    admin = private_to_stark_key(admin_private_key)
+    erc721_def = compile_contract(ERC721_CONTRACT_FILE)
+    if decentral_media_def is None:
+        decentral_media_def = compile_contract(DECMEDIA_CONTRACT_FILE)
+
+    user = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("User Token"), str_to_felt("UT"), admin])
+    content = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("Content Token"), str_to_felt("CT"), admin])
+    comment = await starknet.deploy(
+        contract_def=erc721_def,
+        constructor_calldata=[str_to_felt("Comment Token"), str_to_felt("CMT"), admin])
+    decentral_media = await starknet.deploy(
+        contract_def=decentral_media_def,
+        constructor_calldata=[admin])
+
+    await user.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=admin)
+    await content.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=admin)
+    await comment.transfer_ownership(new_owner=decentral_media.contract_address).invoke(caller_address=admin)
+
+    nonce = generate_nonce()
+    await decentral_media.set_user_erc721_contract(contract=user.contract_address, nonce=nonce).invoke(caller_address=admin,
+        signature=sign_stark_inputs(admin_private_key, [str(user.contract_address), str(nonce)]))
+
+    nonce = generate_nonce()
+    await decentral_media.set_content_erc721_contract(contract=content.contract_address, nonce=nonce).invoke(caller_address=admin,
+        signature=sign_stark_inputs(admin_private_key, [str(content.contract_address), str(nonce)]))
+
+    nonce = generate_nonce()
+    await decentral_media.set_comment_erc721_contract(contract=comment.contract_address, nonce=nonce).invoke(caller_address=admin,
+        signature=sign_stark_inputs(admin_private_key, [str(comment.contract_address), str(nonce)]))
+
+    return DecentralMediaSystem(starknet, decentral_media, user, content, comment)
+
+class SnapshotState(StarknetState):
+    # copy() hands out a lazy child CarriedState that only records its own
+    # writes and reads everything else through this state, instead of deep
+    # copying every contract definition. The child sees later changes made to
+    # its parent, which is fine for view calls and for snapshots of a state
+    # that is not invoked on anymore.
+    def copy(self):
+        return SnapshotState(state=self.state._copy(), general_config=self.general_config)
+
+def snapshot(system):
+    state = SnapshotState.copy(system.starknet.state)
+
+    def rebind(contract):
+        return StarknetContract(state=state,
+                                abi=contract.abi,
+                                contract_address=contract.contract_address,
+                                deploy_execution_info=contract.deploy_execution_info)
+
+    return DecentralMediaSystem(Starknet(state), *[rebind(contract) for contract in system[1:]])
@@ -0,0 +1,139 @@
+import itertools
+import json
+import sqlite3
+
+from starkware.starknet.public.abi import get_selector_from_name
+
+# Event name -> names of its data fields, as declared in the *Functions.cairo modules.
+EVENTS = {
+    'UserCreated': ['token_id', 'address', 'created_at'],
+    'UserUpdated': ['token_id'],
+    'UserFollowed': ['token_id', 'creator_token_id'],
+    'UserUnfollowed': ['token_id', 'creator_token_id'],
+    'UserRated': ['token_id', 'creator_token_id', 'rating'],
+    'UserFlagged': ['token_id', 'flag'],
+    'ContentCreated': ['token_id', 'creator', 'public', 'created_at'],
+    'ContentUpdated': ['token_id', 'public'],
+    'ContentLiked': ['token_id', 'user_token_id'],
+    'ContentDisliked': ['token_id', 'user_token_id'],
+    'ContentViewsRecorded': ['token_id', 'count'],
+    'CommentCreated': ['token_id', 'content', 'creator', 'created_at'],
+    'CommentLiked': ['token_id', 'user_token_id'],
+    'CommentDisliked': ['token_id', 'user_token_id'],
+}
+EVENT_NAMES = {get_selector_from_name(name): name for name in EVENTS}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS checkpoints (contract_address TEXT PRIMARY KEY, position INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS users (token_id INTEGER PRIMARY KEY, address TEXT NOT NULL, created_at INTEGER NOT NULL,
+                                  flagged INTEGER NOT NULL DEFAULT 0, version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS follows (follower INTEGER NOT NULL, creator INTEGER NOT NULL, PRIMARY KEY (follower, creator));
+CREATE TABLE IF NOT EXISTS ratings (user INTEGER NOT NULL, creator INTEGER NOT NULL, rating INTEGER NOT NULL,
+                                    PRIMARY KEY (user, creator));
+CREATE TABLE IF NOT EXISTS contents (token_id INTEGER PRIMARY KEY, creator INTEGER NOT NULL, public INTEGER NOT NULL,
+                                     created_at INTEGER NOT NULL, views INTEGER NOT NULL DEFAULT 0,
+                                     version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS content_reactions (content INTEGER NOT NULL, user INTEGER NOT NULL, reaction INTEGER NOT NULL,
+                                              PRIMARY KEY (content, user));
+CREATE TABLE IF NOT EXISTS comments (token_id INTEGER PRIMARY KEY, content INTEGER NOT NULL, creator INTEGER NOT NULL,
+                                     created_at INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS comment_reactions (comment INTEGER NOT NULL, user INTEGER NOT NULL, reaction INTEGER NOT NULL,
+                                              PRIMARY KEY (comment, user));
+CREATE TABLE IF NOT EXISTS quarantine (contract_address TEXT NOT NULL, position INTEGER NOT NULL, event TEXT NOT NULL,
+                                       data TEXT NOT NULL, PRIMARY KEY (contract_address, position));
+'''
+
+# SQLite integers are signed 64 bit. Events with values outside that range
+# (e.g. token ids n * 2**128 of tokens minted before the token id fix) are
+# kept in the quarantine table with their data as hex strings instead.
+SQLITE_MAX_INTEGER = 2**63 - 1
+QUARANTINE = 'INSERT OR REPLACE INTO quarantine (contract_address, position, event, data) VALUES (?, ?, ?, ?)'
+
+# Every event maps to a single statement, so that runs of the same event can
+# be written with one executemany. Likes are the sum of the reactions.
+STATEMENTS = {
+    'UserCreated': ('INSERT INTO users (token_id, address, created_at) VALUES (?, ?, ?)',
+                    lambda e: (e['token_id'], hex(e['address']), e['created_at'])),
+    'UserUpdated': ('UPDATE users SET version = version + 1 WHERE token_id = ?',
+                    lambda e: (e['token_id'],)),
+    'UserFollowed': ('INSERT INTO follows (follower, creator) VALUES (?, ?)',
+                     lambda e: (e['token_id'], e['creator_token_id'])),
+    'UserUnfollowed': ('DELETE FROM follows WHERE follower = ? AND creator = ?',
+                       lambda e: (e['token_id'], e['creator_token_id'])),
+    'UserRated': ('INSERT INTO ratings (user, creator, rating) VALUES (?, ?, ?)',
+                  lambda e: (e['token_id'], e['creator_token_id'], e['rating'])),
+    'UserFlagged': ('UPDATE users SET flagged = ? WHERE token_id = ?',
+                    lambda e: (e['flag'], e['token_id'])),
+    'ContentCreated': ('INSERT INTO contents (token_id, creator, public, created_at) VALUES (?, ?, ?, ?)',
+                       lambda e: (e['token_id'], e['creator'], e['public'], e['created_at'])),
+    'ContentUpdated': ('UPDATE contents SET public = ?, version = version + 1 WHERE token_id = ?',
+                       lambda e: (e['public'], e['token_id'])),
+    'ContentLiked': ('INSERT OR REPLACE INTO content_reactions (content, user, reaction) VALUES (?, ?, 1)',
+                     lambda e: (e['token_id'], e['user_token_id'])),
+    'ContentDisliked': ('INSERT OR REPLACE INTO content_reactions (content, user, reaction) VALUES (?, ?, -1)',
+                        lambda e: (e['token_id'], e['user_token_id'])),
+    'ContentViewsRecorded': ('UPDATE contents SET views = views + ? WHERE token_id = ?',
+                             lambda e: (e['count'], e['token_id'])),
+    'CommentCreated': ('INSERT INTO comments (token_id, content, creator, created_at) VALUES (?, ?, ?, ?)',
+                       lambda e: (e['token_id'], e['content'], e['creator'], e['created_at'])),
+    'CommentLiked': ('INSERT OR REPLACE INTO comment_reactions (comment, user, reaction) VALUES (?, ?, 1)',
+                     lambda e: (e['token_id'], e['user_token_id'])),
+    'CommentDisliked': ('INSERT OR REPLACE INTO comment_reactions (comment, user, reaction) VALUES (?, ?, -1)',
+                        lambda e: (e['token_id'], e['user_token_id'])),
+}
+
+
+def decode_event(event):
+    name = EVENT_NAMES.get(event.keys[0]) if event.keys else None
+    if name is None:
+        return None, None
+    return name, dict(zip(EVENTS[name], event.data))
+
+
+class Indexer:
+    # Indexes the events of one DecentralMedia contract into SQLite. The
+    # checkpoint is the position in the event log (e.g. starknet.state.events)
+    # up to which events were indexed; it is committed in the same
+    # transaction as the rows, so an interrupted run resumes where it stopped.
+    def __init__(self, path, contract_address, batch_size=1000):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.contract_address = hex(contract_address)
+        self.batch_size = batch_size
+
+    @property
+    def checkpoint(self):
+        row = self.connection.execute('SELECT position FROM checkpoints WHERE contract_address = ?',
+                                      (self.contract_address,)).fetchone()
+        return row[0] if row else 0
+
+    def index(self, events):
+        start = self.checkpoint
+        indexed = 0
+        for position in range(start, len(events), self.batch_size):
+            batch = events[position:position + self.batch_size]
+            statements = []
+            for offset, event in enumerate(batch):
+                if hex(event.from_address) != self.contract_address:
+                    continue
+                name, fields = decode_event(event)
+                if name is None:
+                    continue
+                sql, params = STATEMENTS[name]
+                params = params(fields)
+                if any(isinstance(param, int) and param > SQLITE_MAX_INTEGER for param in params):
+                    statements.append((QUARANTINE, (self.contract_address, position + offset, name,
+                                                    json.dumps({field: hex(value) for field, value in fields.items()}))))
+                    continue
+                statements.append((sql, params))
+
+            with self.connection:
+                for sql, group in itertools.groupby(statements, key=lambda statement: statement[0]):
+                    self.connection.executemany(sql, [params for _, params in group])
+                self.connection.execute('INSERT OR REPLACE INTO checkpoints (contract_address, position) VALUES (?, ?)',
+                                        (self.contract_address, position + len(batch)))
+            indexed += len(statements)
+        return indexed
+
+    def close(self):
+        self.connection.close()
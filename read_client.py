@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from indexer import decode_event
+from utils import felt_array_to_string, decode_tags, uint256, uint256_to_felt
+
+# Decoding of the view results: text fields are decoded to strings, tags to a
+# list of tags and everything else is kept as returned.
+TEXT_FIELDS = {
+    'user': ['username', 'image', 'background_image', 'description', 'social_link'],
+    'content': ['content', 'authors'],
+    'comment': ['comment'],
+}
+
+# Records touched by every event, as (kind, data field with the token id).
+# Users are cached by address, so user token ids are resolved to addresses.
+INVALIDATES = {
+    'UserCreated': [('user_token_id', 'address'), ('user', 'token_id')],
+    'UserUpdated': [('user', 'token_id')],
+    'UserFollowed': [('user', 'token_id'), ('user', 'creator_token_id')],
+    'UserUnfollowed': [('user', 'token_id'), ('user', 'creator_token_id')],
+    'UserRated': [('user', 'token_id'), ('user', 'creator_token_id')],
+    'UserFlagged': [('user', 'token_id')],
+    'ContentCreated': [('content', 'token_id'), ('user', 'creator')],
+    'ContentUpdated': [('content', 'token_id')],
+    'ContentLiked': [('content', 'token_id')],
+    'ContentDisliked': [('content', 'token_id')],
+    'ContentViewsRecorded': [('content', 'token_id')],
+    'CommentCreated': [('comment', 'token_id'), ('content', 'content')],
+    'CommentLiked': [('comment', 'token_id')],
+    'CommentDisliked': [('comment', 'token_id')],
+}
+
+
+def decode_result(kind, result):
+    record = result._asdict()
+    for name in TEXT_FIELDS[kind]:
+        record[name] = felt_array_to_string(record[name])
+    if kind == 'content':
+        record['tags'] = decode_tags(record['tags'])
+    return record
+
+
+class DecentralMediaReader:
+    # Read-through cache of decoded users, contents and comments. An entry is
+    # valid for the block it was read in and until an event of a mutating
+    # external touches its token (see apply_events). Concurrent reads of the
+    # same key share one contract call. Not thread safe; use it from a
+    # single event loop.
+    def __init__(self, decentral_media, max_entries=10000, block_number=None):
+        self.decentral_media = decentral_media
+        self.max_entries = max_entries
+        self.block_number = block_number or (lambda: decentral_media.state.state.block_info.block_number)
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.addresses = {}
+        self.checkpoint = 0
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0, 'evictions': 0,
+                      'hit_time': 0.0, 'miss_time': 0.0}
+
+    async def get_user_token_id(self, address):
+        token_id = await self.get('user_token_id', address, lambda: self.decentral_media.get_user_token_id(address=address),
+                                  lambda result: uint256_to_felt(result.token_id))
+        self.addresses[token_id] = address
+        return token_id
+
+    async def get_user(self, address):
+        return await self.get('user', address, lambda: self.decentral_media.get_user(address=address),
+                              lambda result: decode_result('user', result))
+
+    async def get_content(self, token_id):
+        return await self.get('content', token_id, lambda: self.decentral_media.get_content(token_id=uint256(token_id)),
+                              lambda result: decode_result('content', result))
+
+    async def get_comment(self, token_id):
+        return await self.get('comment', token_id, lambda: self.decentral_media.get_comment(token_id=uint256(token_id)),
+                              lambda result: decode_result('comment', result))
+
+    async def get(self, kind, token, build, decode):
+        start = time.perf_counter()
+        key = (kind, token)
+        block_number = self.block_number()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == block_number:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['hit_time'] += time.perf_counter() - start
+            return entry[1]
+
+        pending = self.pending.get(key)
+        if pending is not None and pending[0] == block_number:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending[1])
+
+        self.stats['misses'] += 1
+        future = asyncio.ensure_future(self.fetch(build, decode))
+        self.pending[key] = (block_number, future)
+        future.add_done_callback(lambda future: self.fetched(key, block_number, future))
+        record = await asyncio.shield(future)
+        self.stats['miss_time'] += time.perf_counter() - start
+        return record
+
+    async def fetch(self, build, decode):
+        exec_info = await build().call()
+        return decode(exec_info.result)
+
+    def fetched(self, key, block_number, future):
+        # Invalidation drops the pending call, so its result is not cached.
+        if self.pending.get(key, (None, None))[1] is not future:
+            return
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.store(key, block_number, future.result())
+
+    def store(self, key, block_number, record):
+        self.entries[key] = (block_number, record)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, kind, token):
+        self.pending.pop((kind, token), None)
+        if self.entries.pop((kind, token), None) is not None:
+            self.stats['invalidations'] += 1
+
+    def invalidate_user(self, token_id):
+        address = self.addresses.get(token_id)
+        if address is not None:
+            self.invalidate('user', address)
+            return
+        # Users read without get_user_token_id cannot be told apart.
+        for key in [key for key in self.entries if key[0] == 'user']:
+            self.invalidate(*key)
+
+    def apply_events(self, events):
+        # events is the event log (e.g. starknet.state.events); like the
+        # indexer, only events after the last applied position are read.
+        for event in events[self.checkpoint:]:
+            if event.from_address != self.decentral_media.contract_address:
+                continue
+            name, fields = decode_event(event)
+            if name is None:
+                continue
+            if name == 'UserCreated':
+                self.addresses[fields['token_id']] = fields['address']
+            for kind, field in INVALIDATES[name]:
+                if kind == 'user':
+                    self.invalidate_user(fields[field])
+                else:
+                    self.invalidate(kind, fields[field])
+        self.checkpoint = len(events)
+
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        summary = dict(self.stats)
+        summary.update({
+            'entries': len(self.entries),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'mean_hit_ms': self.stats['hit_time'] * 1000 / self.stats['hits'] if self.stats['hits'] else 0.0,
+            'mean_miss_ms': self.stats['miss_time'] * 1000 / self.stats['misses'] if self.stats['misses'] else 0.0,
+        })
+        return summary
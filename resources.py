@@ -0,0 +1,80 @@
+import dataclasses
+import statistics
+import time
+from collections import defaultdict, namedtuple
+
+from starkware.starkware_utils.error_handling import StarkException
+
+Sample = namedtuple('Sample', ['external', 'size', 'wall_time', 'n_steps', 'builtins', 'storage_writes'])
+
+
+def storage_writes(starknet_state):
+    return sum(starknet_state.state.contract_address_to_n_storage_writings.values())
+
+async def measure(invocation, view=False, caller_address=0, signature=None):
+    # Views run on a copy of the state, like call(), but through invoke() so
+    # that writes made by a view (e.g. the views counter) are still counted.
+    if view:
+        invocation = dataclasses.replace(invocation, state=invocation.state.copy())
+
+    writes = storage_writes(invocation.state)
+    start = time.perf_counter()
+    exec_info = await invocation.invoke(caller_address=caller_address, signature=signature)
+    wall_time = time.perf_counter() - start
+
+    # The resources of the main call already include those of its internal calls.
+    resources = exec_info.call_info.execution_resources
+    return exec_info, Sample(invocation.name, None, wall_time, resources.n_steps,
+                             dict(resources.builtin_instance_counter),
+                             storage_writes(invocation.state) - writes)
+
+def describe(values):
+    values = sorted(values)
+    return {
+        'mean': statistics.mean(values),
+        'min': values[0],
+        'p50': values[len(values) // 2],
+        'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+        'max': values[-1],
+    }
+
+
+class ResourceRecorder:
+    def __init__(self):
+        self.samples = []
+        self.errors = defaultdict(int)
+
+    async def measure(self, invocation, size=None, view=False, caller_address=0, signature=None):
+        try:
+            exec_info, sample = await measure(invocation, view, caller_address, signature)
+        except StarkException:
+            self.errors[invocation.name] += 1
+            return None
+        self.samples.append(sample._replace(size=size))
+        return exec_info
+
+    def summary(self):
+        samples = defaultdict(list)
+        for sample in self.samples:
+            samples[sample.external].append(sample)
+
+        summary = {}
+        for external in sorted(set(samples) | set(self.errors)):
+            calls = samples[external]
+            summary[external] = {'calls': len(calls), 'errors': self.errors.get(external, 0)}
+            if not calls:
+                continue
+            builtins = sorted(set(name for sample in calls for name in sample.builtins))
+            summary[external].update({
+                'wall_time': describe([sample.wall_time for sample in calls]),
+                'n_steps': describe([sample.n_steps for sample in calls]),
+                'builtins': {name: describe([sample.builtins.get(name, 0) for sample in calls]) for name in builtins},
+                'storage_writes': describe([sample.storage_writes for sample in calls]),
+            })
+        return summary
+
+    def to_json(self):
+        return {
+            'summary': self.summary(),
+            'samples': [sample._asdict() for sample in self.samples],
+        }
@@ -0,0 +1,134 @@
+import dataclasses
+import json
+import os
+from collections import defaultdict
+
+import pytest
+from starkware.starknet.testing.contract import StarknetContractFunctionInvocation
+
+from resources import storage_writes
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resource_baseline.json')
+
+
+class ResourceProfile:
+    # Keeps the peak usage of every external per calldata size. The peak over
+    # the whole suite does not depend on the order the tests run in, so it can
+    # be compared against a committed baseline. Wall time is not kept since it
+    # is not reproducible.
+    def __init__(self):
+        self.peaks = defaultdict(dict)
+
+    def add(self, external, size, exec_info, writes):
+        # The resources of the main call already include those of its internal calls.
+        resources = exec_info.call_info.execution_resources
+        usage = {'n_steps': resources.n_steps, 'storage_writes': writes}
+        usage.update(('builtins.%s' % name, count) for name, count in resources.builtin_instance_counter.items())
+        self.merge({external: {str(size): usage}})
+
+    def merge(self, peaks):
+        for external, sizes in peaks.items():
+            for size, usage in sizes.items():
+                peak = self.peaks[external].setdefault(size, {})
+                for name, value in usage.items():
+                    peak[name] = max(peak.get(name, 0), value)
+
+    def to_json(self):
+        return {external: {size: dict(sorted(sizes[size].items())) for size in sorted(sizes, key=int)}
+                for external, sizes in sorted(self.peaks.items())}
+
+    def regressions(self, baseline, threshold):
+        regressions = []
+        for external, sizes in sorted(self.peaks.items()):
+            for size, usage in sizes.items():
+                expected = baseline.get(external, {}).get(size)
+                if expected is None:
+                    continue
+                for name, value in sorted(usage.items()):
+                    if value > expected.get(name, 0) * (1 + threshold):
+                        regressions.append((external, size, name, expected.get(name, 0), value))
+        return regressions
+
+
+def write_profile(path, profile):
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+        f.write('\n')
+
+def pytest_addoption(parser):
+    group = parser.getgroup('resources', 'execution resources of contract calls')
+    group.addoption('--resource-baseline', default=BASELINE_FILE,
+                    help='baseline of execution resources per external and calldata size')
+    group.addoption('--resource-threshold', type=float, default=0.05,
+                    help='fail when a resource grows by more than this fraction of the baseline')
+    group.addoption('--update-resource-baseline', action='store_true',
+                    help='write the recorded execution resources to the baseline file')
+    group.addoption('--resource-report',
+                    help='also write the recorded execution resources to this file, e.g. to keep them as a CI artifact')
+
+def pytest_configure(config):
+    config.resource_profile = ResourceProfile()
+    config.resource_regressions = []
+    config.resource_baseline_missing = False
+    invoke = StarknetContractFunctionInvocation.invoke
+
+    async def profiled_invoke(self, caller_address=0, max_fee=0, signature=None):
+        writes = storage_writes(self.state)
+        exec_info = await invoke(self, caller_address=caller_address, max_fee=max_fee, signature=signature)
+        config.resource_profile.add(self.name, len(self.calldata), exec_info, storage_writes(self.state) - writes)
+        return exec_info
+
+    async def profiled_call(self, caller_address=0, signature=None):
+        # Like call(), runs on a copy of the state, so that its writes are
+        # counted without being kept. Unlike call(), it goes through the
+        # invoke path (a transaction with signature and fee checks) so that
+        # views get the same execution info as externals.
+        return await profiled_invoke(dataclasses.replace(self, state=self.state.copy()),
+                                     caller_address=caller_address, signature=signature)
+
+    config.resource_original_methods = (invoke, StarknetContractFunctionInvocation.call)
+    StarknetContractFunctionInvocation.invoke = profiled_invoke
+    StarknetContractFunctionInvocation.call = profiled_call
+
+def pytest_unconfigure(config):
+    StarknetContractFunctionInvocation.invoke, StarknetContractFunctionInvocation.call = config.resource_original_methods
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # Collects the profiles of pytest-xdist workers on the controller.
+    node.config.resource_profile.merge(node.workeroutput.get('resource_profile', {}))
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    profile = config.resource_profile.to_json()
+    if hasattr(config, 'workeroutput'):
+        config.workeroutput['resource_profile'] = profile
+        return
+
+    if config.getoption('resource_report'):
+        write_profile(config.getoption('resource_report'), profile)
+    path = config.getoption('resource_baseline')
+    if config.getoption('update_resource_baseline'):
+        write_profile(path, profile)
+        return
+    if not os.path.exists(path):
+        config.resource_baseline_missing = True
+    else:
+        with open(path) as f:
+            baseline = json.load(f)
+        config.resource_regressions = config.resource_profile.regressions(baseline, config.getoption('resource_threshold'))
+
+    if (config.resource_baseline_missing or config.resource_regressions) and exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+def pytest_terminal_summary(terminalreporter, config):
+    if config.resource_baseline_missing:
+        terminalreporter.section('execution resource regressions')
+        terminalreporter.line('%s does not exist; create it with --update-resource-baseline' %
+                              config.getoption('resource_baseline'), red=True)
+        return
+    if not config.resource_regressions:
+        return
+    terminalreporter.section('execution resource regressions')
+    for external, size, name, expected, value in config.resource_regressions:
+        terminalreporter.line('%s (calldata size %s): %s %d -> %d' % (external, size, name, expected, value))
@@ -0,0 +1,17 @@
+import functools
+from starkware.crypto.signature.signature import sign
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+from utils import encode_batch_actions, batch_actions_inputs
+
+
+def sign_stark_inputs(private_key, inputs):
+    message_hash = functools.reduce(
+        lambda x, y: pedersen_hash(y, x),
+        reversed([int(x, 16) if x.startswith('0x') else int(x) for x in inputs]), 0)
+    return sign(msg_hash=message_hash, priv_key=private_key)
+
+def sign_batch_actions(private_key, actions, nonce):
+    action_types, args = encode_batch_actions(actions)
+    signature = sign_stark_inputs(private_key, [str(x) for x in batch_actions_inputs(action_types, args, nonce)])
+    return action_types, args, signature
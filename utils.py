@@ -1,22 +1,136 @@
-import uuid
-from functools import reduce
+import codecs
+import itertools
+import os
+import secrets
+import string
+import threading
 
 MAX_LEN_FELT = 15
+MAX_LEN_TAG = 31
 FIELD_PRIME = 3618502788666131213697322783095070105623107215331596699973092056135872020481
 
+# Packed records, see utils/DecentralMediaHelper.cairo.
+LANE_BOUND = 2**64
+PACKED_FLAG = 2**192
+LIKES_BIAS = 2**63
+
+# Fields of the records returned by get_users, get_contents and get_comments.
+USER_FIELDS = [('username', 'text'), ('image', 'text'), ('background_image', 'text'), ('description', 'text'),
+               ('social_link', 'text'), ('rating', 'array'), ('created_at', 'felt'),
+               ('following_count', 'felt'), ('followers_count', 'felt'), ('contents_count', 'felt')]
+CONTENT_FIELDS = [('content', 'text'), ('tags', 'tags'), ('authors', 'text'), ('likes', 'felt'), ('views', 'felt'),
+                  ('public', 'felt'), ('created_at', 'felt'), ('creator', 'felt'),
+                  ('comments_count', 'felt'), ('liked_by_count', 'felt'), ('disliked_by_count', 'felt')]
+COMMENT_FIELDS = [('comment', 'text'), ('likes', 'felt'), ('created_at', 'felt'), ('creator', 'felt'), ('content', 'felt'),
+                  ('liked_by_count', 'felt'), ('disliked_by_count', 'felt')]
+
+# Action types of batch_actions.
+ACTION_FOLLOW = 1
+ACTION_UNFOLLOW = 2
+ACTION_RATE = 3
+ACTION_LIKE_CONTENT = 4
+ACTION_DISLIKE_CONTENT = 5
+ACTION_LIKE_COMMENT = 6
+ACTION_DISLIKE_COMMENT = 7
+ACTION_CREATE_COMMENT = 8
+
 
 def str_to_felt(text):
-    if len(text) > MAX_LEN_FELT:
+    data = text.encode()
+    if len(data) > MAX_LEN_FELT:
         raise Exception("Text length too long to convert to felt.")
 
-    return int.from_bytes(text.encode(), "big")
+    return int.from_bytes(data, "big")
 
 def felt_to_str(felt):
     length = (felt.bit_length() + 7) // 8
     return felt.to_bytes(length, byteorder="big").decode("utf-8")
 
+def _bytes_to_felts(data, final=True):
+    # Split UTF-8 bytes into felts of at most MAX_LEN_FELT bytes without
+    # cutting a multibyte character in half. Returns the felts and the number
+    # of bytes consumed; without final, a short tail is left for the caller.
+    if data.isascii():
+        end = len(data) if final else len(data) - len(data) % MAX_LEN_FELT
+        return [int.from_bytes(data[i:i+MAX_LEN_FELT], "big") for i in range(0, end, MAX_LEN_FELT)], end
+
+    felts = []
+    pos = 0
+    while len(data) - pos > MAX_LEN_FELT:
+        cut = pos + MAX_LEN_FELT
+        while cut > pos and data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        if cut == pos:
+            raise UnicodeDecodeError("utf-8", data, pos, pos + MAX_LEN_FELT + 1, "no character boundary")
+        felts.append(int.from_bytes(data[pos:cut], "big"))
+        pos = cut
+
+    if final and pos < len(data):
+        felts.append(int.from_bytes(data[pos:], "big"))
+        pos = len(data)
+    return felts, pos
+
 def str_to_felt_array(text):
-    return [str_to_felt(text[i:i+MAX_LEN_FELT]) for i in range(0, len(text), MAX_LEN_FELT)]
+    return _bytes_to_felts(text.encode())[0]
+
+def str_to_felt_arrays(texts):
+    # Slicing the encoded bytes is considerably cheaper than encoding every
+    # 15 character slice separately.
+    return [_bytes_to_felts(text.encode())[0] for text in texts]
+
+def stream_str_to_felts(source, read_size=2**16):
+    # Lazily encode a text/binary file object or an iterable of str/bytes.
+    if hasattr(source, 'read'):
+        file = source
+        source = iter(lambda: file.read(read_size), file.read(0))
+
+    pending = b''
+    for piece in source:
+        if isinstance(piece, str):
+            piece = piece.encode()
+        data = pending + piece
+        felts, pos = _bytes_to_felts(data, final=False)
+        pending = data[pos:]
+        yield from felts
+
+    yield from _bytes_to_felts(pending)[0]
+
+def stream_felts_to_str(felts, sink):
+    # Write decoded text to sink chunk by chunk. The incremental decoder also
+    # copes with arrays whose felts split a multibyte character.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for felt in felts:
+        text = decoder.decode(felt.to_bytes((felt.bit_length() + 7) // 8, "big"))
+        if text:
+            sink.write(text)
+
+    text = decoder.decode(b'', final=True)
+    if text:
+        sink.write(text)
+
+ASCII_LOWERCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def normalize_tag(tag):
+    # Matches the normalization of the contract, which only lowercases ASCII
+    # letters, for tags that are already stripped.
+    tag = tag.strip().translate(ASCII_LOWERCASE)
+    if not tag:
+        raise Exception("Tag is empty.")
+    if len(tag.encode()) > MAX_LEN_TAG:
+        raise Exception("Tag too long to convert to felt.")
+    return tag
+
+def normalize_tags(tags):
+    # Accepts a list of tags or a comma separated string, drops duplicates.
+    if isinstance(tags, str):
+        tags = [tag for tag in tags.split(',') if tag.strip()]
+    return list(dict.fromkeys(normalize_tag(tag) for tag in tags))
+
+def encode_tags(tags):
+    return [int.from_bytes(tag.encode(), "big") for tag in normalize_tags(tags)]
+
+def decode_tags(felts):
+    return [felt_to_str(felt) for felt in felts]
 
 def uint256_to_int(uint256):
     return uint256[0] + uint256[1]*2**128
@@ -30,12 +144,103 @@ def uint256(val):
 def hex_to_felt(val):
     return int(val, 16)
 
+class NonceSource:
+    # Nonces are a random 128 bit prefix followed by a 64 bit counter, so they
+    # never repeat within a process and only collide across processes if two
+    # prefixes do. Forked processes (e.g. pool workers) draw a new prefix.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._prefix = secrets.randbits(128) << 64
+        self._counter = itertools.count()
+
+    def next(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            return self._prefix | next(self._counter)
+
+_nonces = NonceSource()
+
 def generate_nonce():
-    uid = uuid.uuid1().hex
-    return str_to_felt(uid[0:MAX_LEN_FELT])
+    return _nonces.next()
 
 def felt_array_to_string(array):
-    return reduce(lambda x, y: x + felt_to_str(y), array, '')
+    return ''.join(felt_to_str(felt) for felt in array)
+
+def felt_arrays_to_strings(arrays):
+    # Join the raw bytes of each array and decode once, instead of decoding
+    # and concatenating every chunk separately.
+    return [b''.join([felt.to_bytes((felt.bit_length() + 7) // 8, "big") for felt in array]).decode("utf-8")
+            for array in arrays]
+
+def decode_records(offsets, values, fields):
+    # offsets holds the end of every field of every record in values.
+    records = []
+    start = 0
+    for i in range(0, len(offsets), len(fields)):
+        record = {}
+        for (name, kind), end in zip(fields, offsets[i:i + len(fields)]):
+            value = values[start:end]
+            if kind == 'text':
+                record[name] = felt_array_to_string(value)
+            elif kind == 'tags':
+                record[name] = decode_tags(value)
+            elif kind == 'felt':
+                record[name] = value[0]
+            else:
+                record[name] = value
+            start = end
+        records.append(record)
+    return records
+
+def decode_users(offsets, values):
+    return decode_records(offsets, values, USER_FIELDS)
+
+def decode_contents(offsets, values):
+    return decode_records(offsets, values, CONTENT_FIELDS)
+
+def decode_comments(offsets, values):
+    return decode_records(offsets, values, COMMENT_FIELDS)
+
+def encode_batch_actions(actions):
+    # actions is a list of (action_type, arg, ...) tuples, e.g.
+    # (ACTION_RATE, creator_token_id, 5) or (ACTION_CREATE_COMMENT, content_token_id, 'Nice!').
+    # Text arguments are encoded as their length followed by their felts.
+    action_types = []
+    args = []
+    for action_type, *action_args in actions:
+        action_types.append(action_type)
+        for arg in action_args:
+            if isinstance(arg, str):
+                felts = str_to_felt_array(arg)
+                args += [len(felts)] + felts
+            else:
+                args.append(arg)
+    return action_types, args
+
+def batch_actions_inputs(action_types, args, nonce):
+    # The signed inputs of batch_actions.
+    return [len(action_types)] + action_types + args + [nonce]
+
+def pack_lanes(a, b=0, c=0):
+    for lane in (a, b, c):
+        if not 0 <= lane < LANE_BOUND:
+            raise Exception("Value does not fit in a 64 bit lane.")
+    return PACKED_FLAG + a + b * LANE_BOUND + c * LANE_BOUND**2
+
+def unpack_lanes(packed):
+    packed -= PACKED_FLAG
+    return packed % LANE_BOUND, packed // LANE_BOUND % LANE_BOUND, packed // LANE_BOUND**2
+
+def pack_likes(likes):
+    return likes + LIKES_BIAS
+
+def unpack_likes(lane):
+    return lane - LIKES_BIAS
 
 def int_to_negative_felt(val):
     return FIELD_PRIME + val
\ No newline at end of file
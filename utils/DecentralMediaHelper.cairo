@@ -3,14 +3,25 @@
 from starkware.cairo.common.cairo_builtins import HashBuiltin
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.uint256 import Uint256
-from starkware.cairo.common.math import split_felt
+from starkware.cairo.common.math import split_felt, unsigned_div_rem, assert_not_zero, assert_nn_le
+from starkware.cairo.common.math_cmp import is_in_range
+from starkware.cairo.common.memcpy import memcpy
 from utils.Array import concat_arr
+from utils.IndexedSet import indexed_set_add_missing
+from starknet_erc721_storage.IStorage import IStorage
 
 struct Array:
     member len: felt
     member arr: felt*
 end
 
+# Packed records hold three 64 bit lanes in one felt. PACKED_FLAG is set in
+# every packed record, so 0 still means that a record was never written.
+# Signed counters (likes) are stored with LIKES_BIAS added.
+const LANE_BOUND = 2 ** 64
+const PACKED_FLAG = 2 ** 192
+const LIKES_BIAS = 2 ** 63
+
 func deserialize{
     syscall_ptr : felt*,
     pedersen_ptr : HashBuiltin*,
@@ -93,8 +104,160 @@ func felt_to_Uint256{
     range_check_ptr}(
     num_felt: felt) -> (num: Uint256):
 
-    let (low: felt, high: felt) = split_felt(num_felt)
+    # split_felt returns the high half first, so that Uint256_to_felt gives
+    # back num_felt.
+    let (high: felt, low: felt) = split_felt(num_felt)
     let num: Uint256 = Uint256(low, high)
 
     return (num)
 end
+
+func shift_offsets{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    offsets_len: felt,
+    offsets: felt*,
+    shift: felt,
+    res: felt*):
+
+    if offsets_len == 0:
+        return ()
+    end
+
+    assert [res] = [offsets] + shift
+    shift_offsets(offsets_len - 1, offsets + 1, shift, res + 1)
+
+    return ()
+end
+
+# Appends serialized properties (offsets relative to their own values) to a
+# serialized list of records that already holds offsets_len fields.
+func append_properties{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*,
+    properties_offsets_len: felt,
+    properties_offsets: felt*,
+    properties_len: felt,
+    properties: felt*) -> (offsets_len: felt, values_len: felt):
+    alloc_locals
+
+    shift_offsets(properties_offsets_len, properties_offsets, values_len, offsets + offsets_len)
+    memcpy(values + values_len, properties, properties_len)
+
+    return (offsets_len + properties_offsets_len, values_len + properties_len)
+end
+
+func append_array{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*,
+    array_len: felt,
+    array: felt*) -> (offsets_len: felt, values_len: felt):
+    alloc_locals
+
+    memcpy(values + values_len, array, array_len)
+    assert offsets[offsets_len] = values_len + array_len
+
+    return (offsets_len + 1, values_len + array_len)
+end
+
+func append_felt{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    offsets_len: felt,
+    offsets: felt*,
+    values_len: felt,
+    values: felt*,
+    value: felt) -> (offsets_len: felt, values_len: felt):
+
+    assert values[values_len] = value
+    assert offsets[offsets_len] = values_len + 1
+
+    return (offsets_len + 1, values_len + 1)
+end
+
+# Tags are short strings of up to 31 ASCII characters, one felt per tag.
+# Normalizing lowercases their ASCII letters.
+func normalize_tag{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    tag: felt) -> (normalized: felt):
+    alloc_locals
+
+    assert_not_zero(tag)
+    let (high: felt, low: felt) = split_felt(tag)
+    let (local high_lowercase: felt) = lowercase_bytes(high)
+    let (low_lowercase: felt) = lowercase_bytes(low)
+
+    return (high_lowercase * (2 ** 128) + low_lowercase)
+end
+
+func lowercase_bytes{range_check_ptr}(
+    value: felt) -> (res: felt):
+    alloc_locals
+
+    if value == 0:
+        return (0)
+    end
+
+    let (rest: felt, byte: felt) = unsigned_div_rem(value, 256)
+    let (local rest_lowercase: felt) = lowercase_bytes(rest)
+    let (is_upper: felt) = is_in_range(byte, 'A', 'Z' + 1)
+
+    return (rest_lowercase * 256 + byte + is_upper * 32)
+end
+
+func pack_lanes{range_check_ptr}(
+    a: felt,
+    b: felt,
+    c: felt) -> (packed: felt):
+
+    assert_nn_le(a, LANE_BOUND - 1)
+    assert_nn_le(b, LANE_BOUND - 1)
+    assert_nn_le(c, LANE_BOUND - 1)
+
+    return (PACKED_FLAG + a + b * LANE_BOUND + c * LANE_BOUND * LANE_BOUND)
+end
+
+func unpack_lanes{range_check_ptr}(
+    packed: felt) -> (a: felt, b: felt, c: felt):
+
+    let (rest: felt, a: felt) = unsigned_div_rem(packed - PACKED_FLAG, LANE_BOUND)
+    let (c: felt, b: felt) = unsigned_div_rem(rest, LANE_BOUND)
+
+    return (a, b, c)
+end
+
+# Moves a list property of a token (e.g. liked_by) that was kept in the token
+# storage contract before the indexed sets into the set of the token. The
+# property is cleared, so running the migration again does not bring back
+# items that were removed from the set in the meantime.
+func migrate_property_array{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    contract : felt,
+    name : felt,
+    token_id : Uint256,
+    set : felt,
+    owner : felt):
+    alloc_locals
+
+    let (items_len: felt, items: felt*) = IStorage.getPropertyArray(contract, name, token_id)
+    indexed_set_add_missing(set, owner, items_len, items)
+    IStorage.setPropertyArray(contract, name, token_id, 0, items)
+
+    return ()
+end
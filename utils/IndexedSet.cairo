@@ -0,0 +1,178 @@
+%lang starknet
+
+# Sets of felts kept per (set, owner) pair with constant time membership,
+# insertion and removal. Items live in a dense list and the index map holds
+# the 1-based position of every item (0 = not in the set). Removing an item
+# moves the last item into the freed slot, so the list order is not stable.
+
+from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.cairo_builtins import HashBuiltin
+from starkware.cairo.common.math import assert_not_zero, assert_nn
+from starkware.cairo.common.math_cmp import is_le
+
+@storage_var
+func indexed_set_len(set : felt, owner : felt) -> (len : felt):
+end
+
+@storage_var
+func indexed_set_item(set : felt, owner : felt, index : felt) -> (item : felt):
+end
+
+@storage_var
+func indexed_set_index(set : felt, owner : felt, item : felt) -> (index : felt):
+end
+
+func indexed_set_length{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt) -> (len : felt):
+    let (len) = indexed_set_len.read(set, owner)
+    return (len)
+end
+
+func indexed_set_includes{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    item : felt) -> (includes : felt):
+    let (index) = indexed_set_index.read(set, owner, item)
+    if index == 0:
+        return (0)
+    end
+    return (1)
+end
+
+func indexed_set_add{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    item : felt):
+    alloc_locals
+
+    let (index) = indexed_set_index.read(set, owner, item)
+    assert index = 0
+
+    let (local len) = indexed_set_len.read(set, owner)
+    indexed_set_item.write(set, owner, len, item)
+    indexed_set_index.write(set, owner, item, len + 1)
+    indexed_set_len.write(set, owner, len + 1)
+
+    return ()
+end
+
+func indexed_set_remove{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    item : felt):
+    alloc_locals
+
+    let (local index) = indexed_set_index.read(set, owner, item)
+    assert_not_zero(index)
+
+    let (local len) = indexed_set_len.read(set, owner)
+    let (local last) = indexed_set_item.read(set, owner, len - 1)
+    indexed_set_item.write(set, owner, index - 1, last)
+    indexed_set_index.write(set, owner, last, index)
+
+    indexed_set_item.write(set, owner, len - 1, 0)
+    indexed_set_index.write(set, owner, item, 0)
+    indexed_set_len.write(set, owner, len - 1)
+
+    return ()
+end
+
+func indexed_set_read{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    offset : felt,
+    limit : felt) -> (items_len : felt, items : felt*):
+    alloc_locals
+
+    assert_nn(offset)
+    assert_nn(limit)
+
+    let (local len) = indexed_set_len.read(set, owner)
+    let (local items : felt*) = alloc()
+
+    let (offset_in_range) = is_le(offset, len)
+    if offset_in_range == 0:
+        return (0, items)
+    end
+
+    local items_len
+    let (limit_in_range) = is_le(offset + limit, len)
+    if limit_in_range == 1:
+        assert items_len = limit
+    else:
+        assert items_len = len - offset
+    end
+
+    indexed_set_read_items(set, owner, offset, items_len, items)
+
+    return (items_len, items)
+end
+
+func indexed_set_read_items{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    index : felt,
+    n : felt,
+    items : felt*):
+
+    if n == 0:
+        return ()
+    end
+
+    let (item) = indexed_set_item.read(set, owner, index)
+    assert [items] = item
+
+    indexed_set_read_items(set, owner, index + 1, n - 1, items + 1)
+
+    return ()
+end
+
+# Adds the items that are not in the set yet, keeping their order.
+func indexed_set_add_missing{
+    syscall_ptr : felt*,
+    pedersen_ptr : HashBuiltin*,
+    range_check_ptr}(
+    set : felt,
+    owner : felt,
+    items_len : felt,
+    items : felt*):
+
+    if items_len == 0:
+        return ()
+    end
+
+    let (index) = indexed_set_index.read(set, owner, [items])
+    if index == 0:
+        indexed_set_add(set, owner, [items])
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    end
+
+    indexed_set_add_missing(set, owner, items_len - 1, items + 1)
+
+    return ()
+end
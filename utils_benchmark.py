@@ -0,0 +1,55 @@
+import argparse
+import random
+import string
+import timeit
+from functools import reduce
+
+from utils import *
+
+
+def generate_corpus(n_posts, min_len, max_len, seed):
+    rnd = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + ' ,.'
+    return [''.join(rnd.choices(alphabet, k=rnd.randint(min_len, max_len))) for _ in range(n_posts)]
+
+def encode_slice(corpus):
+    return [[str_to_felt(text[i:i+MAX_LEN_FELT]) for i in range(0, len(text), MAX_LEN_FELT)] for text in corpus]
+
+def encode_single(corpus):
+    return [str_to_felt_array(text) for text in corpus]
+
+def decode_single(arrays):
+    return [felt_array_to_string(array) for array in arrays]
+
+def decode_reduce(arrays):
+    return [reduce(lambda x, y: x + felt_to_str(y), array, '') for array in arrays]
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-string and batch felt codecs.')
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--min-len', type=int, default=100)
+    parser.add_argument('--max-len', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.posts, args.min_len, args.max_len, args.seed)
+    arrays = encode_single(corpus)
+
+    assert str_to_felt_arrays(corpus) == arrays
+    assert felt_arrays_to_strings(arrays) == corpus
+
+    print('%d posts, %d bytes, %d felts' % (len(corpus), sum(map(len, corpus)), sum(map(len, arrays))))
+    for name, func, data in [
+            ('encode char slicing (previous)', encode_slice, corpus),
+            ('encode str_to_felt_array', encode_single, corpus),
+            ('encode str_to_felt_arrays', str_to_felt_arrays, corpus),
+            ('decode reduce (previous)', decode_reduce, arrays),
+            ('decode felt_array_to_string', decode_single, arrays),
+            ('decode felt_arrays_to_strings', felt_arrays_to_strings, arrays)]:
+        best = min(timeit.repeat(lambda: func(data), number=1, repeat=args.repeat))
+        print('%-32s %8.1f ms' % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()